@@ -1,101 +1,268 @@
-"""Simple TinyDB wrapper for storing assignments and submissions locally."""
+"""Simple SQLite wrapper for storing assignments and submissions locally."""
 from __future__ import annotations
 
+import asyncio
+import functools
+import sqlite3
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Set, TypeVar
 
-from tinydb import TinyDB, Query
-from tinydb.storages import JSONStorage
-from tinydb.middlewares import CachingMiddleware
+import orjson
 
-DB_PATH = Path(__file__).with_name("db.json")
+DB_PATH = Path(__file__).with_name("db.sqlite3")
+# Pre-SQLite TinyDB store; imported once when the SQLite file is first created
+LEGACY_JSON_PATH = Path(__file__).with_name("db.json")
 
-db = TinyDB(DB_PATH, storage=CachingMiddleware(JSONStorage))
-assignments_table = db.table("assignments")
-submissions_table = db.table("submissions")
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS assignments (
+    id       INTEGER PRIMARY KEY,
+    title    TEXT NOT NULL,
+    diagrams TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS submissions (
+    id            INTEGER PRIMARY KEY,
+    assignment_id INTEGER NOT NULL,
+    student       TEXT NOT NULL,
+    answers       TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS students (
+    id         INTEGER PRIMARY KEY,
+    name       TEXT NOT NULL UNIQUE,
+    strengths  TEXT NOT NULL DEFAULT '[]',
+    challenges TEXT NOT NULL DEFAULT '[]'
+);
+"""
+
+
+def _dumps(obj: Any) -> str:
+    # Stored as TEXT (not BLOB) so SQLite's JSON functions can operate on it
+    return orjson.dumps(obj).decode()
+
+
+_loads = orjson.loads
+
+_is_new_db = not DB_PATH.exists()
+# Autocommit mode: every helper statement is its own transaction unless it
+# runs inside batched_writes(). WAL keeps readers and the writer from blocking
+# each other and makes each commit an append instead of a file rewrite.
+_conn = sqlite3.connect(DB_PATH, isolation_level=None, check_same_thread=False)
+_conn.execute("PRAGMA journal_mode=WAL")
+_conn.execute("PRAGMA synchronous=NORMAL")
+_conn.executescript(_SCHEMA)
+# One connection is shared by the event loop and worker threads
+_lock = threading.RLock()
+
+
+@contextmanager
+def batched_writes() -> Iterator[None]:
+    """Run all helper writes in the block as a single transaction.
+
+    The block must not ``await``: it holds the connection lock throughout.
+    """
+    with _lock:
+        if _conn.in_transaction:  # nested: join the outer transaction
+            yield
+            return
+        _conn.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            _conn.execute("ROLLBACK")
+            raise
+        _conn.execute("COMMIT")
+
+
+def _import_legacy_json():
+    """Copy rows from the old TinyDB ``db.json`` (keeping their ids)."""
+    data = _loads(LEGACY_JSON_PATH.read_bytes())
+    with batched_writes():
+        _conn.executemany(
+            "INSERT INTO assignments (id, title, diagrams) VALUES (?, ?, ?)",
+            [(int(k), d.get("title", ""), _dumps(d.get("diagrams", [])))
+             for k, d in data.get("assignments", {}).items()],
+        )
+        _conn.executemany(
+            "INSERT INTO submissions (id, assignment_id, student, answers) VALUES (?, ?, ?, ?)",
+            [(int(k), d["assignment_id"], d.get("student", ""), _dumps(d.get("answers", [])))
+             for k, d in data.get("submissions", {}).items()],
+        )
+        _conn.executemany(
+            "INSERT OR IGNORE INTO students (id, name, strengths, challenges) VALUES (?, ?, ?, ?)",
+            [(int(k), d["name"], _dumps(d.get("strengths", [])), _dumps(d.get("challenges", [])))
+             for k, d in data.get("students", {}).items()],
+        )
+
+
+if _is_new_db and LEGACY_JSON_PATH.exists():
+    _import_legacy_json()
+
+# Answer file paths are relative to backend/; older external submissions
+# stored them with a leading "backend/". Normalise once instead of per read.
+with _lock:
+    _conn.execute(
+        """UPDATE submissions SET answers = replace(answers, '"file_path":"backend/', '"file_path":"')
+           WHERE answers LIKE '%"file_path":"backend/%'"""
+    )
 
 # ---------------------------------------------------------------------------
 # Assignment helpers
 # ---------------------------------------------------------------------------
 
+def _assignment(row) -> Dict[str, Any]:
+    return {"title": row[1], "diagrams": _loads(row[2])}
+
 def insert_assignment(title: str, diagrams: List[Dict[str, Any]]) -> int:
-    doc = {"title": title, "diagrams": diagrams}
-    assignment_id = assignments_table.insert(doc)
-    db.storage.flush()
-    return assignment_id
+    with _lock:
+        cur = _conn.execute(
+            "INSERT INTO assignments (title, diagrams) VALUES (?, ?)", (title, _dumps(diagrams))
+        )
+    return cur.lastrowid
+
+def insert_assignments_bulk(docs: Iterable[Dict[str, Any]]) -> List[int]:
+    with batched_writes():
+        return [insert_assignment(d["title"], d["diagrams"]) for d in docs]
 
 def get_assignment(assignment_id: int) -> Dict[str, Any] | None:
-    return assignments_table.get(doc_id=assignment_id)
+    with _lock:
+        row = _conn.execute(
+            "SELECT id, title, diagrams FROM assignments WHERE id = ?", (assignment_id,)
+        ).fetchone()
+    return _assignment(row) if row else None
 
 def all_assignments() -> List[Dict[str, Any]]:
-    return [dict(a, id=a.doc_id) for a in assignments_table]
+    with _lock:
+        rows = _conn.execute("SELECT id, title, diagrams FROM assignments ORDER BY id").fetchall()
+    return [dict(_assignment(r), id=r[0]) for r in rows]
 
-def set_diagram_context(assignment_id: int, diagram_idx: int, context_json: str):
-    assignment = assignments_table.get(doc_id=assignment_id)
-    if not assignment:
-        return
-    diagrams: list = assignment.get("diagrams", [])
-    if diagram_idx < 0 or diagram_idx >= len(diagrams):
-        return
-    diagrams[diagram_idx]["context"] = context_json
-    assignments_table.update({"diagrams": diagrams}, doc_ids=[assignment_id])
-    db.storage.flush()
+def set_diagram_context(assignment_id: int, diagram_idx: int, context_json: str | Dict[str, Any]):
+    if not isinstance(context_json, str):
+        context_json = _dumps(context_json)
+    with _lock:
+        assignment = get_assignment(assignment_id)
+        if not assignment:
+            return
+        diagrams: list = assignment.get("diagrams", [])
+        if diagram_idx < 0 or diagram_idx >= len(diagrams):
+            return
+        diagrams[diagram_idx]["context"] = context_json
+        _conn.execute(
+            "UPDATE assignments SET diagrams = ? WHERE id = ?", (_dumps(diagrams), assignment_id)
+        )
 
 # ---------------------------------------------------------------------------
 # Submission helpers
 # ---------------------------------------------------------------------------
 
+def _submission(row) -> Dict[str, Any]:
+    return {"assignment_id": row[1], "student": row[2], "answers": _loads(row[3])}
+
 def insert_submission(assignment_id: int, student: str, answers: List[Dict[str, Any]]) -> int:
-    doc = {"assignment_id": assignment_id, "student": student, "answers": answers}
-    sub_id = submissions_table.insert(doc)
-    db.storage.flush()
-    return sub_id
+    with _lock:
+        cur = _conn.execute(
+            "INSERT INTO submissions (assignment_id, student, answers) VALUES (?, ?, ?)",
+            (assignment_id, student, _dumps(answers)),
+        )
+    return cur.lastrowid
+
+def insert_submissions_bulk(docs: Iterable[Dict[str, Any]]) -> List[int]:
+    with batched_writes():
+        return [insert_submission(d["assignment_id"], d["student"], d["answers"]) for d in docs]
 
 def get_submission(sub_id: int) -> Dict[str, Any] | None:
-    return submissions_table.get(doc_id=sub_id)
+    with _lock:
+        row = _conn.execute(
+            "SELECT id, assignment_id, student, answers FROM submissions WHERE id = ?", (sub_id,)
+        ).fetchone()
+    return _submission(row) if row else None
 
 def all_submissions() -> List[Dict[str, Any]]:
-    return [dict(s, id=s.doc_id) for s in submissions_table]
+    with _lock:
+        rows = _conn.execute(
+            "SELECT id, assignment_id, student, answers FROM submissions ORDER BY id"
+        ).fetchall()
+    return [dict(_submission(r), id=r[0]) for r in rows]
+
+def update_submission_answers(sub_id: int, answers: List[Dict[str, Any]]):
+    with _lock:
+        _conn.execute("UPDATE submissions SET answers = ? WHERE id = ?", (_dumps(answers), sub_id))
 
 # ---------------------------------------------------------------------------
 # Student profile helpers
 # ---------------------------------------------------------------------------
-students_table = db.table("students")
+
+def _student(row) -> Dict[str, Any]:
+    return {"name": row[1], "strengths": _loads(row[2]), "challenges": _loads(row[3]), "id": row[0]}
+
+# Per-student sets mirroring the stored lists, for O(1) duplicate checks
+_FEEDBACK_FIELDS = {"strength": "strengths", "challenge": "challenges"}
+with _lock:
+    _student_rows = _conn.execute("SELECT id, name, strengths, challenges FROM students").fetchall()
+_feedback_seen: Dict[str, Dict[str, Set[str]]] = {
+    field: {r[1]: set(_loads(r[col])) for r in _student_rows}
+    for field, col in (("strengths", 2), ("challenges", 3))
+}
+del _student_rows
 
 def get_or_create_student(name: str) -> Dict[str, Any]:
     """Get existing student or create new one with default profile"""
-    existing = students_table.search(Query().name == name)
-    if existing:
-        return existing[0]
-    
-    # Create new student
-    student_doc = {
-        "name": name,
-        "strengths": [],
-        "challenges": []
-    }
-    student_id = students_table.insert(student_doc)
-    db.storage.flush()
-    return dict(student_doc, id=student_id)
+    with _lock:
+        # name is UNIQUE, so this is an index lookup
+        row = _conn.execute(
+            "SELECT id, name, strengths, challenges FROM students WHERE name = ?", (name,)
+        ).fetchone()
+        if row:
+            return _student(row)
+
+        # Create new student
+        cur = _conn.execute("INSERT INTO students (name) VALUES (?)", (name,))
+    return {"name": name, "strengths": [], "challenges": [], "id": cur.lastrowid}
 
 def add_student_feedback(name: str, feedback_type: str, feedback_text: str):
     """Add strength or challenge to student profile"""
     student = get_or_create_student(name)
-    
-    if feedback_type == "strength":
-        if feedback_text not in student.get("strengths", []):
-            students_table.update(
-                {"strengths": student.get("strengths", []) + [feedback_text]},
-                Query().name == name
-            )
-    elif feedback_type == "challenge":
-        if feedback_text not in student.get("challenges", []):
-            students_table.update(
-                {"challenges": student.get("challenges", []) + [feedback_text]},
-                Query().name == name
-            )
-    
-    db.storage.flush()
+
+    field = _FEEDBACK_FIELDS.get(feedback_type)
+    if field is None:
+        return
+
+    with _lock:
+        seen = _feedback_seen[field].setdefault(name, set(student.get(field, [])))
+        if feedback_text in seen:
+            return
+        seen.add(feedback_text)
+        # Append inside SQLite rather than rewriting the list from a stale read;
+        # `field` comes from _FEEDBACK_FIELDS, never from the caller
+        _conn.execute(
+            f"UPDATE students SET {field} = json_insert({field}, '$[#]', ?) WHERE id = ?",
+            (feedback_text, student["id"]),
+        )
 
 def get_all_students() -> List[Dict[str, Any]]:
-    return [dict(s, id=s.doc_id) for s in students_table]
+    with _lock:
+        rows = _conn.execute("SELECT id, name, strengths, challenges FROM students ORDER BY id").fetchall()
+    return [_student(r) for r in rows]
+
+# ---------------------------------------------------------------------------
+# Async wrappers for request handlers
+# ---------------------------------------------------------------------------
+
+_T = TypeVar("_T")
+
+def _threaded(fn: Callable[..., _T]) -> Callable[..., Awaitable[_T]]:
+    """Wrap a helper so async callers run it in a worker thread, off the event loop."""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    return wrapper
+
+ainsert_assignment = _threaded(insert_assignment)
+aget_assignment = _threaded(get_assignment)
+aall_assignments = _threaded(all_assignments)
+ainsert_submission = _threaded(insert_submission)
+aget_submission = _threaded(get_submission)
+aall_submissions = _threaded(all_submissions)
+aupdate_submission_answers = _threaded(update_submission_answers)
+aadd_student_feedback = _threaded(add_student_feedback)
+aget_all_students = _threaded(get_all_students)
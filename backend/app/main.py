@@ -1,24 +1,23 @@
 # Standard library imports
 import asyncio
-import json
+import hashlib
 import logging
 import os
 import re
+import shutil
 import tempfile
 from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import List, Tuple
 
-import librosa
-import louis
-import numpy as np
-import soundfile as sf
+import aiofiles
+import orjson
 from dotenv import load_dotenv
 from fastapi import FastAPI, File, Form, HTTPException, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from ollama import chat
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 
 load_dotenv()
@@ -29,31 +28,42 @@ if hf_token:
     os.environ["HUGGING_FACE_HUB_TOKEN"] = hf_token
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s")
+logger = logging.getLogger(__name__)
 
 from app.db import (
-    add_student_feedback,
-    all_assignments,
-    all_submissions,
-    db,
-    get_all_students,
-    get_assignment,
-    get_submission,
-    insert_assignment,
-    insert_submission,
-    submissions_table,
+    aadd_student_feedback,
+    aall_assignments,
+    aall_submissions,
+    aget_all_students,
+    aget_assignment,
+    aget_submission,
+    ainsert_assignment,
+    ainsert_submission,
+    aupdate_submission_answers,
 )
-from app.services.lesson_pack_service import generate_lesson_pack
+from app.services.braille_translation import translate_to_braille
+from app.services.dynamic_batcher import DynamicBatcher
+from app.services.lesson_pack_service import stream_lesson_pack
+from app.services.llm_client import chat
 from app.services.progress_bus import register_listener, remove_listener
+from app.services.tts_service import preload_tts_model
 from app.services.yolo_to_text import YOLOBrailleReader
-from app.services.gemma_pipeline import preload_gemma_pipeline, process_audio_with_gemma
+from app.services.gemma_audio_processing import preprocess_audio_for_gemma
+from app.services.gemma_pipeline import (
+    preload_gemma_pipeline,
+    process_audio_with_gemma,
+    warmup_gemma_pipeline,
+)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    import app.services.tts_service as tts_service
-
-    tts_service.preload_tts_model()
-    preload_gemma_pipeline()
+    preload_tts_model()
+    # Gemma loads lazily on first use anyway; GEMMA_PRELOAD=0 skips the
+    # multi-GB load at startup for deployments that rarely need it
+    if os.getenv("GEMMA_PRELOAD", "1") == "1":
+        preload_gemma_pipeline()
+        warmup_gemma_pipeline()
     yield
 
 
@@ -75,55 +85,80 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# backend/ directory; stored file paths are relative to it
+_BACKEND_DIR = Path(__file__).resolve().parent.parent
+
 # Initialize YOLO reader
-model_path = Path(__file__).parent.parent / "models" / "yolo11n.pt"
+model_path = _BACKEND_DIR / "models" / "yolo11n.pt"
 if not model_path.exists():
     print(f"Warning: Model not found at {model_path}")
     reader = None
 else:
-    reader = YOLOBrailleReader(str(model_path), confidence_threshold=0.3)
-
-
-def preprocess_audio_for_gemma(audio_path: str) -> str:
-    """Preprocess audio file for Gemma pipeline processing.
-    
-    Parameters
-    ----------
-    audio_path : str
-        Path to the original audio file.
-        
-    Returns
-    -------
-    str
-        Path to the preprocessed audio file.
-    """
-    # Preprocess audio (based on gemma_audio_processing.py)
-    audio, sr = librosa.load(audio_path, sr=None)
+    reader = YOLOBrailleReader(
+        str(model_path),
+        confidence_threshold=0.3,
+        use_onnx=os.getenv("YOLO_ONNX", "0") == "1",
+    )
+
+
+async def _run_yolo_batch(image_paths: List[str]) -> List[Tuple[List[str], List[str]]]:
+    # One worker thread at a time: the batcher only dispatches the next batch
+    # once this returns
+    return await asyncio.to_thread(reader.predict_and_decode_batch, image_paths)
+
+
+# Concurrent OCR requests share a YOLO forward pass, off the event loop
+_yolo_batcher = DynamicBatcher(_run_yolo_batch, max_batch=8, max_wait_ms=20)
+
+
+# ---------------------------------------------------------------------------
+# Structured LLM responses (schemas are built once, not per request)
+# ---------------------------------------------------------------------------
+class GradeResult(BaseModel):
+    correct: bool
+    explanation: str
+    error_start: int | None = None
+    error_end: int | None = None
+
+
+class SubmissionAnalysis(BaseModel):
+    urdu_text: str
+    english_text: str
+    correct: bool
+    explanation: str
+    error_start: int | None = None
+    error_end: int | None = None
+
+
+class StudentFeedback(BaseModel):
+    trait: str  # max 3 words describing strength or weakness
+
+
+_GRADE_SCHEMA = GradeResult.model_json_schema()
+_ANALYSIS_SCHEMA = SubmissionAnalysis.model_json_schema()
+_FEEDBACK_SCHEMA = StudentFeedback.model_json_schema()
+
 
-    # Convert to mono if stereo
-    if len(audio.shape) > 1:
-        audio = librosa.to_mono(audio)
+# Anything outside this set becomes "_" in names that reach the filesystem
+_SAFE = re.compile(r"[^A-Za-z0-9_-]+")
 
-    # Resample to 16kHz if needed
-    if sr != 16000:
-        audio = librosa.resample(audio, orig_sr=sr, target_sr=16000)
-        sr = 16000
 
-    # Limit duration to 30 seconds
-    max_samples = int(sr * 30)
-    if len(audio) > max_samples:
-        audio = audio[:max_samples]
+def _safe_filename(name: str) -> str:
+    """Sanitise an uploaded file name, keeping a (sanitised) extension."""
+    path = Path(name or "")
+    stem = _SAFE.sub("_", path.stem)[:100] or "file"
+    suffix = _SAFE.sub("", path.suffix)[:10]
+    return f"{stem}.{suffix}" if suffix else stem
 
-    # Ensure float32 and normalize
-    audio = audio.astype(np.float32)
-    max_val = np.max(np.abs(audio))
-    if max_val > 1.0:
-        audio = audio / max_val
 
-    # Save to temporary file
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
-        sf.write(temp_file.name, audio, 16000, subtype="FLOAT")
-        return temp_file.name
+_UPLOAD_CHUNK = 1 << 20  # 1 MiB
+
+
+async def _save_upload(upload: UploadFile, dest: Path) -> None:
+    """Stream *upload* to *dest* chunk by chunk without blocking the event loop."""
+    async with aiofiles.open(dest, "wb") as out:
+        while chunk := await upload.read(_UPLOAD_CHUNK):
+            await out.write(chunk)
 
 
 @app.get("/")
@@ -145,13 +180,12 @@ async def process_braille_image(file: UploadFile = File(...)):
 
     try:
         # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
-            tmp_file_path = tmp_file.name
+        fd, tmp_file_path = tempfile.mkstemp(suffix=".jpg")
+        os.close(fd)
+        await _save_upload(file, Path(tmp_file_path))
 
         # Process image
-        braille_lines, urdu_lines = reader.predict_and_decode(tmp_file_path)
+        braille_lines, urdu_lines = await _yolo_batcher.predict(tmp_file_path)
 
         # Clean up temp file
         os.unlink(tmp_file_path)
@@ -187,8 +221,8 @@ async def progress_stream():
     async def event_generator():
         try:
             while True:
-                event = await q.get()
-                yield f"data: {json.dumps(event)}\n\n"
+                # Already an encoded SSE frame
+                yield await q.get()
         except asyncio.CancelledError:
             pass
         finally:
@@ -206,24 +240,55 @@ async def create_lesson_pack(
 ):
     """files: images, prompts: JSON list matching files order"""
 
-    prompt_list = json.loads(prompts)
+    prompt_list = orjson.loads(prompts)
     if len(prompt_list) != len(files):
         raise HTTPException(status_code=400, detail="files and prompts length mismatch")
 
-    temp_dir = Path(tempfile.mkdtemp())
-    saved_paths: List[Tuple[Path, str]] = []
-    for f, p in zip(files, prompt_list):
-        if not f.content_type.startswith("image/"):
-            raise HTTPException(status_code=400, detail="all files must be images")
-        dest = temp_dir / f.filename
-        with dest.open("wb") as out:
-            out.write(await f.read())
-        saved_paths.append((dest, p))
+    if not all(f.content_type.startswith("image/") for f in files):
+        raise HTTPException(status_code=400, detail="all files must be images")
 
-    aid_int = int(assignment_id) if assignment_id and assignment_id.isdigit() else None
-    zip_path = await generate_lesson_pack(saved_paths, aid_int)
-    safe_title = re.sub(r"[^A-Za-z0-9_-]+", "_", title.strip()) or "lesson_pack"
-    return FileResponse(zip_path, filename=f"{safe_title}.zip")
+    temp_dir = Path(tempfile.mkdtemp())
+    try:
+        # One directory per upload: names that sanitise alike must not share a
+        # path while saved concurrently, and the pack keeps the original name
+        saved_paths: List[Tuple[Path, str]] = []
+        for idx, (f, p) in enumerate(zip(files, prompt_list)):
+            (temp_dir / str(idx)).mkdir()
+            saved_paths.append((temp_dir / str(idx) / _safe_filename(f.filename), p))
+        await asyncio.gather(*(_save_upload(f, dest) for f, (dest, _) in zip(files, saved_paths)))
+
+        aid_int = int(assignment_id) if assignment_id and assignment_id.isdigit() else None
+        safe_title = _SAFE.sub("_", title.strip()) or "lesson_pack"
+        # The first chunk only arrives once an item is complete, so a failure up
+        # to then (bad input, model unreachable) is still a proper HTTP error
+        pack = stream_lesson_pack(saved_paths, aid_int)
+        try:
+            first_chunk = await pack.__anext__()
+        except StopAsyncIteration:
+            first_chunk = b""
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error generating lesson pack: {e}")
+    except BaseException:
+        # Not streaming yet, so the response's cleanup task will never run
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+
+    async def _pack_bytes():
+        try:
+            yield first_chunk
+            async for chunk in pack:
+                yield chunk
+        finally:
+            await pack.aclose()  # client gone: stop the build
+
+    # Zip bytes go out as each entry is written; the uploads are removed
+    # once the stream has finished
+    return StreamingResponse(
+        _pack_bytes(),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{safe_title}.zip"'},
+        background=BackgroundTask(shutil.rmtree, temp_dir, ignore_errors=True),
+    )
 
 
 @app.post("/api/text-to-braille")
@@ -237,11 +302,10 @@ async def text_to_braille(payload: dict):
     if lang not in ("urdu", "english"):
         raise HTTPException(status_code=400, detail="lang must be 'urdu' or 'english'")
 
-    table = "ur-pk-g1.utb" if lang == "urdu" else "en-ueb-g1.ctb"
-    braille = louis.translateString(["braille-patterns.cti", table], text)
-    # strip newlines & excessive whitespace while preserving real spaces
-    braille_clean = " ".join(braille.splitlines())
-    return {"braille_text": braille_clean}
+    # Cached and shared with the lesson pack; newlines come back as spaces.
+    # A miss is a blocking liblouis call, so it must not run on the loop.
+    braille = await asyncio.to_thread(translate_to_braille, text, lang)
+    return {"braille_text": braille}
 
 
 # New endpoint: Urdu to English translation using Ollama LLM
@@ -254,18 +318,18 @@ async def translate_urdu_to_english(payload: dict):
     if not text:
         raise HTTPException(status_code=400, detail="text required")
 
-    def _call_llm(urdu: str, question_context: str = "") -> str:
+    async def _call_llm(urdu: str, question_context: str = "") -> str:
         if question_context:
             prompt = f"This is a student's answer to the question: '{question_context}'\n\nTranslate the following Urdu text to English, keeping the question context in mind:\n\n{urdu}\n\nProvide only the translated English sentence(s) without additional commentary. Do not include any text not mentioned in the student's answer."
         else:
             prompt = f"Translate the following Urdu text to English:\n\n{urdu}\n\nProvide only the translated English sentence(s) without additional commentary."
-        response = chat(
+        response = await chat(
             model="gemma3n:e2b", messages=[{"role": "user", "content": prompt}]
         )
         return response.message.content.strip()
 
     try:
-        english_text: str = await asyncio.to_thread(_call_llm, text, question)
+        english_text: str = await _call_llm(text, question)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"translation error: {e}")
 
@@ -282,7 +346,7 @@ async def translate_urdu_to_english_internal(text: str) -> str:
 # ASSIGNMENT CRUD
 # ---------------------------------------------------------------------------
 
-UPLOADS_DIR = (Path(__file__).parent.parent / "uploads").resolve()
+UPLOADS_DIR = _BACKEND_DIR / "uploads"
 
 UPLOADS_DIR.mkdir(exist_ok=True)
 # Serve uploaded files statically so the frontend can access them
@@ -297,42 +361,43 @@ async def create_assignment(
     contexts: str | None = Form(None),
 ):
     """Save assignment diagrams (images) + prompts and return assignment id."""
-    prompt_list = json.loads(prompts)
+    prompt_list = orjson.loads(prompts)
     if len(prompt_list) != len(files):
         raise HTTPException(status_code=400, detail="files and prompts length mismatch")
 
-    context_list = json.loads(contexts) if contexts else [None] * len(files)
+    context_list = orjson.loads(contexts) if contexts else [None] * len(files)
     if len(context_list) != len(files):
         raise HTTPException(status_code=400, detail="contexts length mismatch")
 
     diagrams_meta: List[dict] = []
+    dest_paths: List[Path] = []
     for idx, (f, p, ctx) in enumerate(zip(files, prompt_list, context_list)):
         if not f.content_type.startswith("image/"):
             raise HTTPException(status_code=400, detail="all files must be images")
-        filename = f"assign_{title}_{idx}_{f.filename}"
+        filename = f"assign_{_SAFE.sub('_', title)}_{idx}_{_safe_filename(f.filename)}"
         dest_path = UPLOADS_DIR / filename
-        with dest_path.open("wb") as out:
-            out.write(await f.read())
+        dest_paths.append(dest_path)
         diagrams_meta.append(
             {
-                "image_path": str(dest_path.relative_to(Path(__file__).parent.parent)),
+                "image_path": str(dest_path.relative_to(_BACKEND_DIR)),
                 "prompt": p,
                 "context": ctx or p,
             }
         )
 
-    assignment_id = insert_assignment(title, diagrams_meta)
+    await asyncio.gather(*(_save_upload(f, dest) for f, dest in zip(files, dest_paths)))
+    assignment_id = await ainsert_assignment(title, diagrams_meta)
     return {"assignment_id": assignment_id}
 
 
 @app.get("/api/assignments")
 async def list_assignments():
-    return all_assignments()
+    return await aall_assignments()
 
 
 @app.get("/api/assignments/{assignment_id}")
 async def get_assignment_details(assignment_id: int):
-    assignment = get_assignment(assignment_id)
+    assignment = await aget_assignment(assignment_id)
     if not assignment:
         raise HTTPException(status_code=404, detail="assignment not found")
     return assignment
@@ -362,7 +427,7 @@ async def create_external_submission(payload: dict):
         )
 
     # ensure assignment exists
-    if not get_assignment(assignment_id):
+    if not await aget_assignment(assignment_id):
         raise HTTPException(status_code=404, detail="assignment not found")
 
     # validate answers minimal fields
@@ -372,12 +437,14 @@ async def create_external_submission(payload: dict):
                 status_code=400,
                 detail="answers must have diagram_idx, answer_type, file_path",
             )
+        # Stored paths are relative to backend/; accept repo-relative ones too
+        a["file_path"] = a["file_path"].removeprefix("backend/")
         a.setdefault("urdu_text", "")
         a.setdefault("english_text", "")
         a.setdefault("braille_text", None)
         a.setdefault("errors", [])
 
-    sub_id = insert_submission(assignment_id, student, answers)
+    sub_id = await ainsert_submission(assignment_id, student, answers)
     return {"submission_id": sub_id}
 
 
@@ -391,7 +458,7 @@ async def submit_assignment(
     answer_type: str = Form("image"),  # 'image' or 'audio'
     file: UploadFile = File(...),
 ):
-    assignment = get_assignment(assignment_id)
+    assignment = await aget_assignment(assignment_id)
     if not assignment:
         raise HTTPException(status_code=404, detail="assignment not found")
 
@@ -401,10 +468,9 @@ async def submit_assignment(
         )
 
     # Save file
-    dest_name = f"sub_{assignment_id}_{student}_{file.filename}"
+    dest_name = f"sub_{assignment_id}_{_SAFE.sub('_', student)}_{_safe_filename(file.filename)}"
     dest_path = UPLOADS_DIR / dest_name
-    with dest_path.open("wb") as out:
-        out.write(await file.read())
+    await _save_upload(file, dest_path)
 
     # Get question context for better translation
     diagram_meta = assignment["diagrams"][0]  # using diagram_idx 0 for now
@@ -414,55 +480,47 @@ async def submit_assignment(
     if answer_type == "image":
         if not reader:
             raise HTTPException(status_code=500, detail="YOLO model not loaded")
-        braille_lines, urdu_lines = reader.predict_and_decode(str(dest_path))
+        braille_lines, urdu_lines = await _yolo_batcher.predict(str(dest_path))
         braille_text = "\n".join(braille_lines)
         urdu_text = "\n".join(urdu_lines)
         english_text = ""  # can translate later
     else:  # audio processing
         braille_text = None
-        # Preprocess audio for Gemma
-        preprocessed_audio_path = preprocess_audio_for_gemma(str(dest_path))
-        try:
-            urdu_text, english_text = await process_audio_with_gemma(
-                preprocessed_audio_path, question
-            )
-        finally:
-            # Clean up temp file
-            if os.path.exists(preprocessed_audio_path):
-                os.remove(preprocessed_audio_path)
+        # Preprocess audio for Gemma; the samples go to the model in memory
+        audio = await asyncio.to_thread(preprocess_audio_for_gemma, str(dest_path))
+        urdu_text, english_text = await process_audio_with_gemma(audio, question)
 
     answers = [
         {
             "diagram_idx": 0,  # keep simple for now
             "answer_type": answer_type,
-            "file_path": str(dest_path.relative_to(Path(__file__).parent.parent)),
+            "file_path": str(dest_path.relative_to(_BACKEND_DIR)),
             "urdu_text": urdu_text,
             "braille_text": braille_text,
             "english_text": english_text,
         }
     ]
 
-    sub_id = insert_submission(assignment_id, student, answers)
+    sub_id = await ainsert_submission(assignment_id, student, answers)
     return {"submission_id": sub_id}
 
 
 @app.get("/api/submissions")
 async def list_submissions():
-    return all_submissions()
+    return await aall_submissions()
+
+
+def _context_digest(diagram_json) -> str:
+    """Fingerprint of a diagram context, stored with grades computed against it."""
+    return hashlib.sha256(str(diagram_json).encode("utf-8")).hexdigest()
 
 
 @app.post("/api/submissions/{submission_id}/autograde")
-async def autograde_submission(submission_id: int, answer_index: int = 0):
-    sub = get_submission(submission_id)
+async def autograde_submission(submission_id: int, answer_index: int = 0, force: bool = False):
+    sub = await aget_submission(submission_id)
     if not sub:
         raise HTTPException(status_code=404, detail="submission not found")
 
-    class GradeResult(BaseModel):
-        correct: bool
-        explanation: str
-        error_start: int | None = None
-        error_end: int | None = None
-
     # Validate answer_index
     if answer_index < 0 or answer_index >= len(sub["answers"]):
         raise HTTPException(
@@ -471,11 +529,17 @@ async def autograde_submission(submission_id: int, answer_index: int = 0):
         )
 
     ans = sub["answers"][answer_index]
-    assignment = get_assignment(sub["assignment_id"])
+    assignment = await aget_assignment(sub["assignment_id"])
     diagram_meta = assignment["diagrams"][ans["diagram_idx"]]
     question = diagram_meta["prompt"]
     diagram_json = diagram_meta["context"]
 
+    # Image answers are graded together with their OCR correction; that grade
+    # stands until the diagram context changes or a regrade is forced
+    if (not force and ans.get("grade")
+            and ans.get("grade_context") == _context_digest(diagram_json)):
+        return ans["grade"]
+
     # Single LLM call for grading and error location
     is_image = ans["answer_type"] == "image"
 
@@ -502,11 +566,10 @@ async def autograde_submission(submission_id: int, answer_index: int = 0):
             "Respond with a JSON object containing 'correct' (boolean) and 'explanation' (string)."
         )
 
-    grade_schema = GradeResult.model_json_schema()
-    grade_response = chat(
+    grade_response = await chat(
         model="gemma3n:e2b",
         messages=[{"role": "user", "content": grade_prompt}],
-        format=grade_schema,
+        format=_GRADE_SCHEMA,
     )
     grade_result = GradeResult.model_validate_json(grade_response.message.content)
 
@@ -518,34 +581,85 @@ async def autograde_submission(submission_id: int, answer_index: int = 0):
     }
 
 
-@app.get("/api/submissions/{submission_id}")
-async def get_submission_details(submission_id: int):
-    """Fetch submission and, if text fields are missing, automatically compute them."""
-    sub = get_submission(submission_id)
-    if not sub:
-        raise HTTPException(status_code=404, detail="submission not found")
-
-    # Get assignment context for translation
-    assignment = get_assignment(sub["assignment_id"])
-    if not assignment:
-        raise HTTPException(status_code=404, detail="assignment not found")
+# Serialises answer enrichment per submission so concurrent viewers don't
+# redo the OCR/LLM work or overwrite each other's results. Entries only live
+# while someone holds or waits for them: lock plus number of users.
+_SUB_LOCKS: dict[int, tuple[asyncio.Lock, int]] = {}
 
-    updated_needed = False
 
-    for ans in sub["answers"]:
-        # Only process if urdu_text is missing or empty
-        if ans.get("urdu_text"):
-            continue
+@asynccontextmanager
+async def _submission_lock(submission_id: int):
+    lock, users = _SUB_LOCKS.get(submission_id, (None, 0))
+    lock = lock or asyncio.Lock()
+    _SUB_LOCKS[submission_id] = (lock, users + 1)
+    try:
+        async with lock:
+            yield
+    finally:
+        lock, users = _SUB_LOCKS[submission_id]
+        if users == 1:
+            del _SUB_LOCKS[submission_id]
+        else:
+            _SUB_LOCKS[submission_id] = (lock, users - 1)
+
+
+async def _complete_submission_texts(submission_id: int, sub: dict, assignment: dict):
+    """Compute missing Urdu/English texts for *sub*'s answers and persist them."""
+    async def _correct_ocr_answer(ans: dict, raw_urdu: str, question: str, diagram_json: str):
+        # --- Validate, translate and grade the Urdu via Gemma in one call ---
+        # Grading shares the question/diagram prefix with the correction, so
+        # the result is stored on the answer and autograde reuses it
+        prompt = (
+            "The following Urdu text may contain OCR errors or mangled words. "
+            "This is a student's answer to a specific question. Use the question context to help correct and translate the text.\n\n"
+            f"Original Question: {question}\n\n"
+            f"Diagram context (JSON):\n{diagram_json}\n\n"
+            "If the text is completely incoherent, just write N/A. "
+            "If it is just incoherent, rewrite it to be coherent while staying "
+            "faithful to the student's original answer and considering the question context. "
+            "If it is both coherent and comprehensible, return the original text. "
+            "Then provide an English translation that makes sense in the context of the question.\n\n"
+            f"Student's Urdu Text:\n{raw_urdu}\n\n"
+            "Finally, grade the answer using ONLY the diagram JSON as factual context.\n\n"
+            "Respond ONLY with a JSON object that matches this schema, containing:\n"
+            "- 'urdu_text' (string): the corrected Urdu text\n"
+            "- 'english_text' (string): the English translation\n"
+            "- 'correct' (boolean): whether the answer is correct\n"
+            "- 'explanation' (string): 1-2 sentence explanation\n"
+            "- 'error_start' (int or null): if incorrect, start character position of error in the corrected Urdu text\n"
+            "- 'error_end' (int or null): if incorrect, end character position of error in the corrected Urdu text\n"
+            "For error positions, pinpoint the specific word or phrase rather than the entire sentence."
+        )
+        response = await chat(
+            model="gemma3n:e2b",
+            messages=[{"role": "user", "content": prompt}],
+            format=_ANALYSIS_SCHEMA,
+        )
+        content = response.message.content
+        try:
+            parsed = SubmissionAnalysis.model_validate_json(content)
+            ans["urdu_text"] = parsed.urdu_text.strip()
+            ans["english_text"] = parsed.english_text.strip()
+            ans["grade"] = parsed.model_dump(
+                include={"correct", "explanation", "error_start", "error_end"}
+            )
+            ans["grade_context"] = _context_digest(diagram_json)
+        except Exception:
+            logger.warning("Error parsing JSON: %s", content)
+            ans["urdu_text"] = raw_urdu
+            ans["english_text"] = ""
+        ans["errors"] = []
+
+    async def _process_answer(ans: dict) -> bool:
+        """Fill in *ans* in place; False if it couldn't be processed."""
         if ans["answer_type"] == "image":
-            # Fix file path - remove 'backend/' prefix if present
-            file_path = ans["file_path"].replace("backend/", "", 1)
-            img_path = Path(__file__).parent.parent / file_path
+            img_path = _BACKEND_DIR / ans["file_path"]
             if not img_path.exists():
-                continue  # can't process
+                return False  # can't process
             # Run YOLO OCR
             if not reader:
-                continue
-            braille_lines, urdu_lines = reader.predict_and_decode(str(img_path))
+                return False
+            braille_lines, urdu_lines = await _yolo_batcher.predict(str(img_path))
             ans["braille_text"] = "\n".join(braille_lines)
             raw_urdu = "\n".join(urdu_lines)
 
@@ -553,75 +667,59 @@ async def get_submission_details(submission_id: int):
             diagram_meta = assignment["diagrams"][ans["diagram_idx"]]
             question = diagram_meta["prompt"]
 
-            # --- Validate & translate Urdu via Gemma ---
-            class UrduEnglishCorrection(BaseModel):
-                urdu_text: str
-                english_text: str
-
-            schema = UrduEnglishCorrection.model_json_schema()
-            prompt = (
-                "The following Urdu text may contain OCR errors or mangled words. "
-                "This is a student's answer to a specific question. Use the question context to help correct and translate the text.\n\n"
-                f"Original Question: {question}\n\n"
-                "If the text is completely incoherent, just write N/A. "
-                "If it is just incoherent, rewrite it to be coherent while staying "
-                "faithful to the student's original answer and considering the question context. "
-                "If it is both coherent and comprehensible, return the original text. "
-                "Then provide an English translation that makes sense in the context of the question. "
-                "Do not add any other text except the translations.\n\n"
-                f"Student's Urdu Text:\n{raw_urdu}\n\n"
-                "Respond ONLY with a JSON object that matches this schema."
-            )
-            response = chat(
-                model="gemma3n:e2b",
-                messages=[{"role": "user", "content": prompt}],
-                format=schema,
-            )
-            content = response.message.content
-            try:
-                parsed = UrduEnglishCorrection.model_validate_json(content)
-                ans["urdu_text"] = parsed.urdu_text.strip()
-                ans["english_text"] = parsed.english_text.strip()
-            except Exception as e:
-                print(f"Error parsing JSON: {content}")
-                ans["urdu_text"] = raw_urdu
-                ans["english_text"] = ""
-            ans["errors"] = []
-            updated_needed = True
+            await _correct_ocr_answer(ans, raw_urdu, question, diagram_meta["context"])
         else:  # audio processing
-            # Fix file path - remove 'backend/' prefix if present
-            file_path = ans["file_path"].replace("backend/", "", 1)
-            audio_path = Path(__file__).parent.parent / file_path
+            audio_path = _BACKEND_DIR / ans["file_path"]
             if not audio_path.exists():
-                continue
+                return False
 
             # Get the original question for context
             diagram_meta = assignment["diagrams"][ans["diagram_idx"]]
             question = diagram_meta["prompt"]
 
-            # Preprocess audio for Gemma
-            preprocessed_audio_path = preprocess_audio_for_gemma(str(audio_path))
-            try:
-                urdu_text, english_text = await process_audio_with_gemma(
-                    preprocessed_audio_path, question
-                )
-            finally:
-                # Clean up temp file
-                if os.path.exists(preprocessed_audio_path):
-                    os.remove(preprocessed_audio_path)
+            # Preprocess audio for Gemma; the samples go to the model in memory
+            audio = await asyncio.to_thread(preprocess_audio_for_gemma, str(audio_path))
+            urdu_text, english_text = await process_audio_with_gemma(audio, question)
             ans["urdu_text"] = urdu_text
             ans["english_text"] = english_text
             ans["braille_text"] = None
             ans["errors"] = []
-            updated_needed = True
+        return True
+
+    # Answers are independent: concurrent ones share YOLO and Gemma batches
+    # and overlap their LLM calls. Only answers missing urdu_text are processed.
+    processed = await asyncio.gather(
+        *(_process_answer(ans) for ans in sub["answers"] if not ans.get("urdu_text"))
+    )
 
-    if updated_needed:
+    if any(processed):
         # Persist updates
-        submissions_table.update({"answers": sub["answers"]}, doc_ids=[submission_id])
-        db.storage.flush()
+        await aupdate_submission_answers(submission_id, sub["answers"])
+
+
+@app.get("/api/submissions/{submission_id}")
+async def get_submission_details(submission_id: int):
+    """Fetch submission and, if text fields are missing, automatically compute them."""
+    sub = await aget_submission(submission_id)
+    if not sub:
+        raise HTTPException(status_code=404, detail="submission not found")
+
+    # Get assignment context for translation
+    assignment = await aget_assignment(sub["assignment_id"])
+    if not assignment:
+        raise HTTPException(status_code=404, detail="assignment not found")
+
+    if any(not ans.get("urdu_text") for ans in sub["answers"]):
+        # A request that waited here re-reads the submission and finds the
+        # texts already filled in by the one that held the lock
+        async with _submission_lock(submission_id):
+            sub = await aget_submission(submission_id)
+            if not sub:
+                raise HTTPException(status_code=404, detail="submission not found")
+            await _complete_submission_texts(submission_id, sub, assignment)
 
     # attach assignment for convenience
-    sub["assignment"] = get_assignment(sub["assignment_id"])
+    sub["assignment"] = await aget_assignment(sub["assignment_id"])
     return sub
 
 
@@ -629,9 +727,6 @@ async def get_submission_details(submission_id: int):
 async def analyze_feedback_for_student(payload: dict):
     """Analyze feedback and generate strength/weakness for student profile"""
 
-    class StudentFeedback(BaseModel):
-        trait: str  # max 3 words describing strength or weakness
-
     feedback_text = payload.get("feedback", "").strip()
     is_correct = payload.get("is_correct", False)
     student_name = payload.get("student_name", "").strip()
@@ -651,17 +746,16 @@ async def analyze_feedback_for_student(payload: dict):
         f"Respond with a JSON object containing 'trait' (1-3 words max)."
     )
 
-    schema = StudentFeedback.model_json_schema()
-    response = chat(
+    response = await chat(
         model="gemma3n:e2b",
         messages=[{"role": "user", "content": prompt}],
-        format=schema,
+        format=_FEEDBACK_SCHEMA,
     )
     parsed = StudentFeedback.model_validate_json(response.message.content)
 
     # Save to student profile
     feedback_type = "strength" if is_correct else "challenge"
-    add_student_feedback(student_name, feedback_type, parsed.trait)
+    await aadd_student_feedback(student_name, feedback_type, parsed.trait)
 
     return {"trait": parsed.trait, "type": feedback_type}
 
@@ -669,7 +763,7 @@ async def analyze_feedback_for_student(payload: dict):
 @app.get("/api/students")
 async def get_students():
     """Get all student profiles with strengths and challenges"""
-    return get_all_students()
+    return await aget_all_students()
 
 
 @app.get("/api/health")
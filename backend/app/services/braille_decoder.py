@@ -2,7 +2,9 @@
 # Convert class IDs back to original Braille and then to Urdu text.
 # Reverses all transformations applied during dataset generation.
 
+import functools
 import louis
+import numpy as np
 from typing import List, Tuple, Optional
 import pathlib
 import re
@@ -13,6 +15,83 @@ NUM_CLASSES = 64               # 0-63 inclusive (original range)
 MAX_BRAILLE_CHAR = 0x28FF      # Maximum possible braille character (U+28FF)
 BLANK_CELL = "\u2800"          # Unicode blank Braille cell (represents space)
 
+# Anything other than 6-dot Braille cells, spaces and line breaks
+_CLEAN_RE = re.compile(
+    f"[^{chr(UNICODE_BRAILLE_BASE)}-{chr(UNICODE_BRAILLE_BASE + NUM_CLASSES - 1)} \n\r]"
+)
+# Urdu consonants that can take the aspiration marker ھ (each listed once)
+_URDU_CONSONANTS = 'بپتٹثجچحخدڈذرڑزژسشصضطظعغفقکگلمنوہء'
+# Consonant followed by « that should be ھ (aspirated consonant marker)
+_ASPIRATED_RE = re.compile(f'([{re.escape(_URDU_CONSONANTS)}])«')
+# Standalone « at word end that should be ؟
+_QMARK_RE = re.compile(r'«(?=\s|$)')
+
+# Post back-translation cleanup: drop liblouis artifacts (GS control char and
+# stray slashes) and map any blank cell that slipped through to a space.
+# Spaces must still be restored *before* back-translation, since liblouis
+# treats U+2800 and ASCII space differently.
+_POST_TRANSLATE = str.maketrans({'\x1d': None, '/': None, BLANK_CELL: ' '})
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; fall back to the NumPy implementation
+    njit = None
+
+
+def _group_lines_numpy(class_ids: np.ndarray, x: np.ndarray, y: np.ndarray,
+                       threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Group detections presorted by y into lines and sort each line by x.
+
+    Returns the reordered class IDs as one flat array plus the length of each line.
+    """
+    breaks = np.flatnonzero(np.abs(np.diff(y)) > threshold) + 1
+    segments = np.split(np.arange(len(class_ids)), breaks)
+    class_ids_out = np.concatenate(
+        [class_ids[seg[np.argsort(x[seg], kind='stable')]] for seg in segments]
+    )
+    line_lengths = np.diff(np.concatenate(([0], breaks, [len(class_ids)])))
+    return class_ids_out, line_lengths
+
+
+def _group_lines_kernel(class_ids, x, y, threshold):
+    """Loop version of `_group_lines_numpy`, compiled with numba when available."""
+    n = class_ids.shape[0]
+    class_ids_out = np.empty(n, dtype=class_ids.dtype)
+    line_lengths = np.empty(n, dtype=np.int64)
+    x_scratch = np.empty(n, dtype=x.dtype)
+    n_lines = 0
+    line_start = 0
+    for i in range(1, n + 1):
+        if i < n and abs(y[i] - y[i - 1]) <= threshold:
+            continue
+        # Stable insertion sort of the line by x; lines are short
+        for j in range(line_start, i):
+            xj = x[j]
+            cj = class_ids[j]
+            k = j
+            while k > line_start and x_scratch[k - 1] > xj:
+                x_scratch[k] = x_scratch[k - 1]
+                class_ids_out[k] = class_ids_out[k - 1]
+                k -= 1
+            x_scratch[k] = xj
+            class_ids_out[k] = cj
+        line_lengths[n_lines] = i - line_start
+        n_lines += 1
+        line_start = i
+    return class_ids_out, line_lengths[:n_lines]
+
+
+if njit is not None:
+    _group_lines = njit(cache=True, fastmath=True)(_group_lines_kernel)
+else:
+    _group_lines = _group_lines_numpy
+
+
+@functools.lru_cache(maxsize=4096)
+def _back_translate(table: str, text: str) -> str:
+    """Back-translate *text* with liblouis, memoized since lines often repeat."""
+    return louis.backTranslateString([table], text)
+
 class BrailleDecoder:
     def __init__(self, louis_table: str = 'ur-pk-g1.utb'):
         """
@@ -31,28 +110,23 @@ class BrailleDecoder:
             print(f"Warning: Could not load Louis table '{louis_table}': {e}")
             print("Make sure liblouis is installed with Urdu table support")
     
-    def class_ids_to_braille_chars(self, class_ids: List[int]) -> List[str]:
+    def class_ids_to_braille_chars(self, class_ids: np.ndarray) -> str:
         """
         Convert class IDs to Braille Unicode characters.
         
         Args:
-            class_ids: List of class IDs (0-63) from object detection model
+            class_ids: Array of class IDs (0-63) from object detection model
             
         Returns:
-            List of Braille Unicode characters
+            String of Braille Unicode characters, one per class ID
         """
-        braille_chars = []
-        for class_id in class_ids:
-            if 0 <= class_id < NUM_CLASSES:
-                # Convert class ID back to Unicode Braille character
-                unicode_point = UNICODE_BRAILLE_BASE + class_id
-                braille_char = chr(unicode_point)
-                braille_chars.append(braille_char)
-            else:
-                print(f"Warning: Invalid class ID {class_id}, using blank cell")
-                braille_chars.append(BLANK_CELL)
-        
-        return braille_chars
+        ids = np.asarray(class_ids, dtype=np.int32)
+        invalid = (ids < 0) | (ids >= NUM_CLASSES)
+        if invalid.any():
+            print(f"Warning: Invalid class IDs {ids[invalid].tolist()}, using blank cell")
+        # Invalid IDs fall back to class 0, i.e. the blank cell
+        ids = np.where(invalid, 0, ids) + UNICODE_BRAILLE_BASE
+        return ids.astype('<u4').tobytes().decode('utf-32-le')
     
     def reconstruct_lines_from_positions(self, 
                                        detections: List[Tuple[int, float, float]], 
@@ -70,35 +144,43 @@ class BrailleDecoder:
         if not detections:
             return []
         
-        # Sort by y-coordinate first (top to bottom), then x-coordinate (left to right)
-        sorted_detections = sorted(detections, key=lambda d: (d[2], d[1]))
-        
-        # Group detections into lines based on y-coordinate proximity
-        lines = []
-        current_line = []
-        current_y = sorted_detections[0][2]
+        det = np.asarray(detections, dtype=np.float32)
+        return self.reconstruct_lines_from_arrays(
+            det[:, 0].astype(np.int16), det[:, 1], det[:, 2], line_height_threshold
+        )
+    
+    def reconstruct_lines_from_arrays(self,
+                                      class_ids: np.ndarray,
+                                      x: np.ndarray,
+                                      y: np.ndarray,
+                                      line_height_threshold: float = 0.05) -> List[str]:
+        """
+        Reconstruct Braille text lines from parallel detection arrays.
         
-        for class_id, x, y in sorted_detections:
-            # If y-coordinate differs significantly, start a new line
-            if abs(y - current_y) > line_height_threshold:
-                if current_line:
-                    # Sort current line by x-coordinate and convert to characters
-                    current_line.sort(key=lambda d: d[1])  # Sort by x
-                    line_chars = self.class_ids_to_braille_chars([d[0] for d in current_line])
-                    lines.append("".join(line_chars))
-                
-                current_line = [(class_id, x, y)]
-                current_y = y
-            else:
-                current_line.append((class_id, x, y))
+        Args:
+            class_ids: Class IDs of the detections (int16)
+            x: Normalized x-centers of the detections (float32)
+            y: Normalized y-centers of the detections (float32)
+            line_height_threshold: Normalized threshold for line separation
+            
+        Returns:
+            List of Braille text lines
+        """
+        if len(class_ids) == 0:
+            return []
         
-        # Add the last line
-        if current_line:
-            current_line.sort(key=lambda d: d[1])  # Sort by x
-            line_chars = self.class_ids_to_braille_chars([d[0] for d in current_line])
-            lines.append("".join(line_chars))
+        # Sort by y-coordinate (top to bottom), then split into lines wherever the
+        # vertical gap exceeds the threshold and sort each line by x (left to right)
+        order = np.argsort(y, kind='stable')
+        sorted_ids, line_lengths = _group_lines(
+            class_ids[order], x[order], y[order], float(line_height_threshold)
+        )
         
-        return lines
+        # Convert all characters at once, then cut the string into lines
+        text = self.class_ids_to_braille_chars(sorted_ids)
+        ends = np.cumsum(line_lengths).tolist()
+        starts = [0] + ends[:-1]
+        return [text[start:end] for start, end in zip(starts, ends)]
     
     def restore_spaces_from_blank_cells(self, braille_text: str) -> str:
         """
@@ -123,34 +205,26 @@ class BrailleDecoder:
         Returns:
             Cleaned braille text with only valid braille characters
         """
-        cleaned = ""
-        for char in braille_text:
-            char_code = ord(char)
-            # Keep valid Braille characters (U+2800 to U+283F) and spaces
-            if (UNICODE_BRAILLE_BASE <= char_code < UNICODE_BRAILLE_BASE + NUM_CLASSES) or char == " ":
-                cleaned += char
-            elif char in ['\n', '\r']:  # Keep line breaks
-                cleaned += char
-            # Skip other characters (like the special sequences we see in the test)
-        
-        return cleaned
+        # Keep valid Braille characters (U+2800 to U+283F), spaces and line breaks;
+        # drop other characters (like the special sequences we see in the test)
+        return _CLEAN_RE.sub('', braille_text)
 
     def _normalise_aspirates(self, txt: str) -> str:
         """Normalize HEH variants that liblouis returns incorrectly."""
         # Handle specific patterns where liblouis returns « instead of proper characters
-        
-        # Pattern 1: Replace « that should be ھ (aspirated consonant marker)
-        # Look for consonant + « patterns 
-        aspirated_pattern = r'([بپتٹثجچحخددڈذرڑزژسشصضطظعغفقکگلمنوہء])«'
-        txt = re.sub(aspirated_pattern, r'\1ھ', txt)
-        
-        # Pattern 2: Replace standalone « at word end that should be ؟
-        txt = re.sub(r'«(?=\s|$)', '؟', txt)
+        txt = _ASPIRATED_RE.sub(r'\1ھ', txt)
+        txt = _QMARK_RE.sub('؟', txt)
         
         # Clean up any remaining « characters
-        txt = txt.replace('«', '')
-        
-        return txt
+        return txt.replace('«', '')
+    
+    def _clean_urdu(self, urdu_text: str) -> str:
+        """Post-process liblouis output into presentable Urdu text."""
+        # Remove common encoding artifacts in a single pass
+        urdu_text = urdu_text.translate(_POST_TRANSLATE)
+        # Collapse aspirated consonant sequences (ڈ ھ → ڈھ)
+        urdu_text = self._normalise_aspirates(urdu_text)
+        return urdu_text.strip()
     
     def braille_to_urdu(self, braille_text: str) -> Optional[str]:
         """
@@ -170,15 +244,11 @@ class BrailleDecoder:
             braille_with_spaces = self.restore_spaces_from_blank_cells(cleaned_braille)
             
             # Use liblouis to back-translate
-            urdu_text = louis.backTranslateString([self.louis_table], braille_with_spaces)
+            urdu_text = _back_translate(self.louis_table, braille_with_spaces)
             
             # Clean up the result
             if urdu_text:
-                # Remove common encoding artifacts
-                urdu_text = urdu_text.replace('\35', '').replace('/', '')
-                # Collapse aspirated consonant sequences (ڈ ھ → ڈھ)
-                urdu_text = self._normalise_aspirates(urdu_text)
-                urdu_text = urdu_text.strip()
+                urdu_text = self._clean_urdu(urdu_text)
                 
             return urdu_text if urdu_text else None
             
@@ -199,8 +269,7 @@ class BrailleDecoder:
             Tuple of (braille_text, urdu_text)
         """
         # Convert class IDs to Braille characters
-        braille_chars = self.class_ids_to_braille_chars(class_ids)
-        braille_text = "".join(braille_chars)
+        braille_text = self.class_ids_to_braille_chars(np.asarray(class_ids, dtype=np.int16))
         
         # Convert Braille to Urdu
         urdu_text = self.braille_to_urdu(braille_text)
@@ -222,14 +291,54 @@ class BrailleDecoder:
         """
         # Reconstruct lines from positions
         braille_lines = self.reconstruct_lines_from_positions(detections, line_height_threshold)
+        return braille_lines, self._lines_to_urdu(braille_lines)
+    
+    def decode_from_arrays(self,
+                           class_ids: np.ndarray,
+                           x: np.ndarray,
+                           y: np.ndarray,
+                           line_height_threshold: float = 0.05) -> Tuple[List[str], List[str]]:
+        """
+        Full pipeline: Convert parallel detection arrays to multi-line Braille and Urdu.
+        
+        Args:
+            class_ids: Class IDs of the detections
+            x: Normalized x-centers of the detections
+            y: Normalized y-centers of the detections
+            line_height_threshold: Normalized threshold for line separation
+            
+        Returns:
+            Tuple of (braille_lines, urdu_lines)
+        """
+        braille_lines = self.reconstruct_lines_from_arrays(class_ids, x, y, line_height_threshold)
+        return braille_lines, self._lines_to_urdu(braille_lines)
+    
+    def _lines_to_urdu(self, braille_lines: List[str]) -> List[str]:
+        """
+        Back-translate all lines with a single liblouis call.
+        
+        Args:
+            braille_lines: Braille text lines
+            
+        Returns:
+            One Urdu line per Braille line (empty string where conversion failed)
+        """
+        if not braille_lines:
+            return []
+        
+        joined = "\n".join(self.clean_braille_text(line) for line in braille_lines)
+        joined = self.restore_spaces_from_blank_cells(joined)
+        try:
+            urdu_lines = _back_translate(self.louis_table, joined).split("\n")
+        except Exception as e:
+            print(f"Error converting Braille to Urdu: {e}")
+            urdu_lines = []
         
-        # Convert each line to Urdu
-        urdu_lines = []
-        for braille_line in braille_lines:
-            urdu_line = self.braille_to_urdu(braille_line)
-            urdu_lines.append(urdu_line if urdu_line is not None else "")
+        if len(urdu_lines) != len(braille_lines):
+            # liblouis did not keep the line breaks; fall back to one call per line
+            return [self.braille_to_urdu(line) or "" for line in braille_lines]
         
-        return braille_lines, urdu_lines
+        return [self._clean_urdu(line) for line in urdu_lines]
 
 
 def demo_usage():
@@ -0,0 +1,50 @@
+"""
+Shared, cached liblouis translation for the API and the lesson pack service.
+"""
+
+import functools
+import logging
+import threading
+
+import louis
+
+logger = logging.getLogger(__name__)
+
+# Full table lists, resolved once
+_BRAILLE_TABLES = {
+    "urdu": ["braille-patterns.cti", "ur-pk-g1.utb"],
+    "english": ["braille-patterns.cti", "en-ueb-g1.ctb"],
+}
+# liblouis keeps translation state in static buffers; one call at a time
+_louis_lock = threading.Lock()
+
+# Compile both tables now so the first request doesn't pay for it
+try:
+    for _tables in _BRAILLE_TABLES.values():
+        louis.checkTable(_tables)
+except Exception as e:  # missing tables surface again on first translation
+    logger.warning("Could not preload liblouis tables: %s", e)
+
+
+@functools.lru_cache(maxsize=4096)
+def translate_to_braille(text: str, lang: str) -> str:
+    """Translate *text* to Grade-1 Unicode braille on a single line.
+
+    Parameters
+    ----------
+    text : str
+        Text to translate.
+    lang : str
+        ``"urdu"`` selects the Urdu table; anything else uses English UEB.
+
+    Returns
+    -------
+    str
+        The braille, with line breaks replaced by spaces. Results are cached,
+        so repeated texts skip liblouis entirely.
+    """
+    tables = _BRAILLE_TABLES["urdu" if lang == "urdu" else "english"]
+    with _louis_lock:
+        braille = louis.translateString(tables, text)
+    # Flatten paragraph breaks without building an intermediate list
+    return braille.replace("\n", " ")
@@ -0,0 +1,110 @@
+"""
+Coalesce concurrent single-item requests into batched model calls.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+
+class DynamicBatcher:
+    """Queue items from concurrent callers and run them through *batch_fn* together.
+
+    Parameters
+    ----------
+    batch_fn : Callable[[List[Any]], Awaitable[List[Any]]]
+        Coroutine function mapping a list of items to a list of results in the
+        same order. It is never called with more than *max_batch* items. If a
+        batch raises, its items are retried one at a time so an exception only
+        reaches the caller whose item caused it.
+    max_batch : int
+        Upper bound on items per call.
+    max_wait_ms : float
+        How long the first item of a batch waits for company before the batch
+        is dispatched anyway.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], Awaitable[List[Any]]],
+                 max_batch: int = 8, max_wait_ms: float = 50):
+        self._batch_fn = batch_fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    async def predict(self, item: Any) -> Any:
+        """Submit *item* and wait for its result (or exception)."""
+        # Queue and worker are bound to the running loop, so create them on first use
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[Any, asyncio.Future]]:
+        """Block for one item, then gather more until the batch fills or time runs out."""
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _call(self, items: List[Any]) -> List[Any]:
+        """Run *batch_fn*, insisting on one result per item."""
+        results = await self._batch_fn(items)
+        if len(results) != len(items):
+            raise RuntimeError(f"batch_fn returned {len(results)} results for {len(items)} items")
+        return results
+
+    async def _run(self):
+        batch: List[Tuple[Any, asyncio.Future]] = []
+        try:
+            while True:
+                batch = await self._collect()
+                # Callers that gave up (e.g. client disconnected) don't need compute
+                batch = [(item, fut) for item, fut in batch if not fut.cancelled()]
+                if not batch:
+                    continue
+                try:
+                    results = await self._call([item for item, _ in batch])
+                except Exception as e:
+                    if len(batch) == 1:
+                        if not batch[0][1].done():
+                            batch[0][1].set_exception(e)
+                        continue
+                    # One bad item (e.g. an unreadable upload) must not fail the
+                    # others: rerun them one by one so only its caller sees the error
+                    await self._run_singly(batch)
+                    continue
+                for (_, fut), result in zip(batch, results):
+                    if not fut.done():
+                        fut.set_result(result)
+        finally:
+            # The worker is stopping (cancelled, or a BaseException escaped):
+            # nothing else will resolve the batch in hand or the queued items
+            pending = list(batch)
+            while not self._queue.empty():
+                pending.append(self._queue.get_nowait())
+            for _, fut in pending:
+                if not fut.done():
+                    fut.set_exception(RuntimeError("batch worker stopped"))
+
+    async def _run_singly(self, batch: List[Tuple[Any, asyncio.Future]]):
+        """Call *batch_fn* once per item, resolving each future on its own."""
+        for item, fut in batch:
+            if fut.done():
+                continue
+            try:
+                (result,) = await self._call([item])
+            except Exception as e:
+                if not fut.done():
+                    fut.set_exception(e)
+                continue
+            if not fut.done():
+                fut.set_result(result)
@@ -1,9 +1,39 @@
 import os
-import librosa
-import soundfile as sf
 import numpy as np
+import soundfile as sf
+import soxr
+import torch
 from transformers import AutoProcessor, AutoModelForImageTextToText
 
+TARGET_SR = 16000
+
+
+def load_audio_16k_mono(audio_path, max_duration=30):
+    """
+    Decode *audio_path* to mono float32 at 16 kHz, keeping at most
+    *max_duration* seconds.
+
+    libsndfile handles WAV/FLAC/OGG/MP3 directly; anything it can't decode
+    (e.g. m4a) falls back to librosa, which is imported only then.
+    """
+    try:
+        audio, sr = sf.read(audio_path, dtype="float32", always_2d=False)
+    except RuntimeError:  # soundfile.LibsndfileError: unsupported container
+        import librosa
+
+        audio, _ = librosa.load(audio_path, sr=TARGET_SR, mono=True, dtype=np.float32,
+                                res_type="soxr_hq", duration=max_duration)
+        return audio
+
+    # Trim before downmixing/resampling so neither touches discarded samples
+    audio = audio[:int(sr * max_duration)]
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1, dtype=np.float32)
+    if sr != TARGET_SR:
+        audio = soxr.resample(audio, sr, TARGET_SR, quality="HQ")
+    return audio
+
+
 def preprocess_audio_for_gemma(audio_path, max_duration=30):
     """
     Preprocess audio to meet Gemma's requirements:
@@ -11,41 +41,21 @@ def preprocess_audio_for_gemma(audio_path, max_duration=30):
     - 16kHz sample rate
     - Float32 bit depth in range [-1, 1]
     - Maximum 30 seconds duration
+
+    Returns the samples as a float32 array; the processor takes it directly,
+    so nothing is written to disk.
     """
-    # Load audio file
-    audio, sr = librosa.load(audio_path, sr=None)
-    
-    # Convert to mono if stereo
-    if len(audio.shape) > 1:
-        audio = librosa.to_mono(audio)
+    audio = load_audio_16k_mono(audio_path, max_duration)
     
-    # Resample to 16kHz if needed
-    if sr != 16000:
-        audio = librosa.resample(audio, orig_sr=sr, target_sr=16000)
-        sr = 16000
+    # Normalize to [-1, 1] only if needed (the decoders already do this, but double-check)
+    if audio.size:
+        max_val = max(audio.max(), -audio.min())
+        if max_val > 1.0:
+            audio = audio / max_val
     
-    # Limit duration to max_duration seconds
-    max_samples = int(sr * max_duration)
-    if len(audio) > max_samples:
-        audio = audio[:max_samples]
-        print(f"Audio trimmed to {max_duration} seconds")
-    
-    # Ensure float32 and normalize to [-1, 1] range
-    audio = audio.astype(np.float32)
-    
-    # Normalize if needed (librosa already does this, but double-check)
-    max_val = np.max(np.abs(audio))
-    if max_val > 1.0:
-        audio = audio / max_val
-    
-    # Save preprocessed audio to temporary file using the exact pattern from working code
-    temp_audio_path = "temp_processed_audio.wav"
-    sf.write(temp_audio_path, audio, 16000, subtype="FLOAT")
-    
-    duration_seconds = len(audio) / sr
+    duration_seconds = len(audio) / TARGET_SR
     print(f"Audio duration: {duration_seconds:.2f}s")
-    print("Audio path: ", temp_audio_path)
-    return temp_audio_path
+    return audio
 
 
 # Update instruction to include the model schema
@@ -58,30 +68,42 @@ instruction = f"""Translate the following audio to both Urdu and English. Your r
 ```
 """
 
-# Load model
+# Model is loaded on first use so importing this module stays cheap
 PRETRAINED_MODEL = "google/gemma-3n-E4B-it"
-processor = AutoProcessor.from_pretrained(PRETRAINED_MODEL)
-model = AutoModelForImageTextToText.from_pretrained(PRETRAINED_MODEL)
-
-# Get project root directory for relative path
-project_root = "/Users/qasim.khan/Documents/gemma3nImpactChallenge/braille-bridge"
-audio_file = os.path.join(project_root, "cactus-eng.m4a")
-
-# Preprocess audio for Gemma
-processed_audio_path = preprocess_audio_for_gemma(audio_file)
-
-messages = [
-    {
-        "role": "user",
-        "content": [
-            {"type": "audio", "audio": processed_audio_path},
-            {"type": "text", "text": instruction}
-        ]
-    },
-]
-print("Messages:", messages)
-
-try:
+_processor = None
+_model = None
+
+
+def _get_model():
+    """Return ``(processor, model)``, loading them on the first call."""
+    global _processor, _model
+    if _model is None:
+        _processor = AutoProcessor.from_pretrained(PRETRAINED_MODEL)
+        # bf16 halves weight bandwidth where the hardware supports it natively
+        dtype = torch.bfloat16 if torch.cuda.is_available() and torch.cuda.is_bf16_supported() else torch.float32
+        _model = AutoModelForImageTextToText.from_pretrained(PRETRAINED_MODEL, torch_dtype=dtype).eval()
+    return _processor, _model
+
+
+def main():
+    processor, model = _get_model()
+
+    # Get project root directory for relative path
+    project_root = "/Users/qasim.khan/Documents/gemma3nImpactChallenge/braille-bridge"
+    audio_file = os.path.join(project_root, "cactus-eng.m4a")
+
+    # Preprocess audio for Gemma
+    audio = preprocess_audio_for_gemma(audio_file)
+
+    messages = [
+        {
+            "role": "user",
+            "content": [
+                {"type": "audio", "audio": audio},
+                {"type": "text", "text": instruction}
+            ]
+        },
+    ]
     inputs = processor.apply_chat_template(
         messages,
         add_generation_prompt=True,
@@ -91,11 +113,17 @@ try:
     )
     inputs = inputs.to(model.device, dtype=model.dtype)
 
-    outputs = model.generate(**inputs, max_new_tokens=1024)
+    with torch.inference_mode():
+        outputs = model.generate(
+            **inputs,
+            max_new_tokens=1024,
+            use_cache=True,
+            do_sample=False,
+            pad_token_id=processor.tokenizer.eos_token_id,
+        )
     result = processor.decode(outputs[0][inputs["input_ids"].shape[-1]:])
     print(result)
 
-finally:
-    # Clean up temporary file
-    if os.path.exists(processed_audio_path):
-        os.remove(processed_audio_path)
\ No newline at end of file
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,23 @@
-import json
+import functools
+import shutil
 import tempfile
 import os
 import zipfile
-import shutil
 import asyncio
 from pathlib import Path
-from typing import List, Tuple
+from typing import AsyncIterator, List, Tuple
 
-import louis
 import logging
-from fastapi import HTTPException
-from ollama import AsyncClient
+import orjson
+from pydantic import BaseModel, ValidationError
 
 # Import for lesson pack generation
 from app.services.progress_bus import push as emit_progress
 from app.db import set_diagram_context
-from app.services.tts_service import synthesize
+from app.services.tts_service import synthesize_async
 from app.services.gemma_pipeline import process_image_with_gemma
-
-# --- Load heavy models at module import ------------------------------
-
-_ollama_client = AsyncClient()
+from app.services.braille_translation import translate_to_braille
+from app.services.llm_client import chat
 
 # --------------------------------------------------------------------
 # Logger setup
@@ -31,9 +28,17 @@ logger.setLevel(logging.INFO)
 
 # --------------------------------------------------------------------
 
+_PROMPTS_DIR = Path(__file__).parent.parent.parent / "prompts"
+
+
+@functools.lru_cache(maxsize=4)
+def _prompt(name: str) -> str:
+    """Read a prompt template from ``backend/prompts`` once per process."""
+    return (_PROMPTS_DIR / name).read_text()
+
+
 async def _diagram_json_from_image(image_path: Path) -> dict:
-    instruction = Path(__file__).parent.parent.parent / "prompts" / "diagram2json.txt"
-    instruction = instruction.read_text()
+    instruction = _prompt("diagram2json.txt")
     raw = await process_image_with_gemma(image_path, instruction)
     # Remove any trailing special tokens (like <end_of_turn>) and whitespace before parsing
     cleaned = raw.strip()
@@ -46,21 +51,49 @@ async def _diagram_json_from_image(image_path: Path) -> dict:
         if end != -1:
             cleaned = cleaned[start:end].strip()
     print(cleaned)
-    data = json.loads(cleaned)
+    data = orjson.loads(cleaned)
     return data
 
 
-async def _english_and_urdu_scripts(diagram_json: dict) -> Tuple[str, str]:
-    if not _ollama_client:
-        raise HTTPException(status_code=500, detail="Ollama client not available")
+class NarrationScripts(BaseModel):
+    english: str
+    urdu: str
 
-    json_str = json.dumps(diagram_json, ensure_ascii=False, indent=2)
-    script_prompt_path = Path(__file__).parent.parent.parent / "prompts" / "json2script.txt"
-    script_prompt = script_prompt_path.read_text() if script_prompt_path.exists() else "Convert this JSON to a script."
+
+_SCRIPTS_SCHEMA = NarrationScripts.model_json_schema()
+
+
+async def _english_and_urdu_scripts(diagram_json: dict) -> Tuple[str, str]:
+    json_str = orjson.dumps(diagram_json, option=orjson.OPT_INDENT_2).decode()
+    try:
+        script_prompt = _prompt("json2script.txt")
+    except FileNotFoundError:
+        script_prompt = "Convert this JSON to a script."
 
     english_prompt = f"{script_prompt}\n\nHere is the JSON:\n```json\n{json_str}\n```"
 
-    english_resp = await _ollama_client.chat(
+    # One round-trip for both languages; the Urdu is translated from the
+    # English script within the same response.
+    combined_prompt = (
+        english_prompt
+        + "\n\nRespond with a JSON object containing 'english' (the narration script) and "
+        "'urdu' (the same script translated into simple, child friendly Urdu while keeping "
+        "the meaning intact)."
+    )
+    combined_resp = await chat(
+        model="gemma3n:e2b",
+        messages=[{"role": "user", "content": combined_prompt}],
+        format=_SCRIPTS_SCHEMA,
+    )
+    try:
+        parsed = NarrationScripts.model_validate_json(combined_resp['message']['content'])
+        english_script, urdu_script = parsed.english.strip(), parsed.urdu.strip()
+        if english_script and urdu_script:
+            return english_script, urdu_script
+    except ValidationError as e:
+        logger.warning("Combined script response did not parse, falling back: %s", e)
+
+    english_resp = await chat(
         model="gemma3n:e2b",
         messages=[{"role": "user", "content": english_prompt}],
     )
@@ -71,7 +104,7 @@ async def _english_and_urdu_scripts(diagram_json: dict) -> Tuple[str, str]:
         "while keeping the meaning intact. Output only the Urdu text.\n\n"
         + english_script
     )
-    urdu_resp = await _ollama_client.chat(
+    urdu_resp = await chat(
         model="gemma3n:e2b",
         messages=[{"role": "user", "content": urdu_prompt}],
     )
@@ -79,102 +112,264 @@ async def _english_and_urdu_scripts(diagram_json: dict) -> Tuple[str, str]:
     return english_script, urdu_script
 
 
-def _text_to_braille(text: str, lang: str) -> str:
-    table = "ur-pk-g1.utb" if lang == "urdu" else "en-ueb-g1.ctb"
-    braille = louis.translateString(["braille-patterns.cti", table], text)
-    return " ".join(braille.splitlines())
+def _text_to_braille_both_sync(english: str, urdu: str) -> Tuple[str, str]:
+    return translate_to_braille(english, "english"), translate_to_braille(urdu, "urdu")
+
+
+async def _text_to_braille_both(english: str, urdu: str) -> Tuple[str, str]:
+    """Translate both narration scripts in a single worker-thread hop."""
+    return await asyncio.to_thread(_text_to_braille_both_sync, english, urdu)
 
 
-def _braille_to_svg(braille_text: str, out_path: Path, cols: int = 24):
-    """Render braille text to an SVG file with fixed column wrapping.
+_SVG_ROW = '<text x="0" y="{y}" font-family="SimBraille, sans-serif" font-size="32">{line}</text>'
+_XML_ESCAPE = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+
+
+def _braille_to_svg(braille_text: str, cols: int = 24) -> str:
+    """Render braille text to an SVG document with fixed column wrapping.
 
     Each row contains at most *cols* characters (default 24).
     """
-    # Split text into rows of `cols` characters
-    lines = [braille_text[i : i + cols] for i in range(0, len(braille_text), cols)]
-
     char_width = 16  # fits SimBraille nicely at font-size 32
     line_height = 40  # vertical distance between baselines
 
+    nrows = -(-len(braille_text) // cols)
     svg_width = cols * char_width
-    svg_height = 48 + max(0, len(lines) - 1) * line_height
+    svg_height = 48 + max(0, nrows - 1) * line_height
 
-    parts: list[str] = [
+    # Rows are sliced before escaping so entities don't count towards `cols`
+    rows = "".join(
+        _SVG_ROW.format(
+            y=32 + i * line_height,  # baseline position
+            line=braille_text[i * cols : (i + 1) * cols].translate(_XML_ESCAPE),
+        )
+        for i in range(nrows)
+    )
+    return (
         f'<svg xmlns="http://www.w3.org/2000/svg" width="{svg_width}" height="{svg_height}">'
-    ]
+        f"{rows}</svg>"
+    )
+
+
+# Already-compressed media gain nothing from DEFLATE; text compresses well
+# even at the fastest level.
+_STORED_SUFFIXES = {".wav", ".png", ".jpg", ".jpeg"}
+
+
+def _zip_kwargs(arcname: str) -> dict:
+    if Path(arcname).suffix.lower() in _STORED_SUFFIXES:
+        return {"compress_type": zipfile.ZIP_STORED}
+    return {"compress_type": zipfile.ZIP_DEFLATED, "compresslevel": 1}
+
+
+def _zip_put(zf: zipfile.ZipFile, arcname: str, data: str | bytes):
+    """Write in-memory *data* straight into the pack."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    zf.writestr(arcname, data, **_zip_kwargs(arcname))
+
+
+async def _zip_file(zf: zipfile.ZipFile, arcname: str, path: Path):
+    """Copy an on-disk file into the pack without staging it first.
+
+    The file is read in a worker thread; only the in-memory write into *zf*
+    happens on the event loop, which keeps zip writes serialised.
+    """
+    data = await asyncio.to_thread(path.read_bytes)
+    _zip_put(zf, arcname, data)
 
-    for row_idx, line in enumerate(lines):
-        y = 32 + row_idx * line_height  # baseline position
-        parts.append(
-            f'<text x="0" y="{y}" font-family="SimBraille, sans-serif" font-size="32">{line}</text>'
-        )
 
-    parts.append("</svg>")
-    out_path.write_text("".join(parts), encoding="utf-8")
+# Items in flight at once; Gemma generation is serialised separately in
+# gemma_pipeline, so this mainly overlaps Ollama chats, TTS and file work.
+_ITEM_CONCURRENCY = 4
 
 
-async def generate_lesson_pack(pairs: List[Tuple[Path, str]], assignment_id: int | None = None) -> Path:
-    """Generate a zipped lesson pack and return the zip path.
+async def _process_item(idx: int, img_path: Path, prompt: str, zf: zipfile.ZipFile,
+                        sink: "_ZipStreamSink", tmpdir: Path, total: int,
+                        assignment_id: int | None) -> None:
+    """Add the ``item_<idx>/`` entries for a single (image, prompt) pair to *zf*.
 
-    Logging at INFO level provides progress feedback in the server logs.
+    Blocking work (SQLite, liblouis, SVG layout, TTS) runs in worker threads.
+    Zip writes stay on the event loop, which keeps them serialised across the
+    items sharing *zf*; each batch of writes first waits for *sink* to drain.
+    """
+    emit_progress({"status": "processing", "idx": idx, "total": total, "filename": img_path.name})
+    logger.info("[%d/%d] Processing image: %s", idx, total, img_path.name)
+    prefix = f"item_{idx}/"
+    await sink.drain()
+    await _zip_file(zf, prefix + img_path.name, img_path)
+    _zip_put(zf, prefix + "question.txt", prompt)
+
+    logger.info("[%d/%d] Extracting diagram data", idx, total)
+    diagram_json = await _diagram_json_from_image(img_path)
+    emit_progress({"status": "diagram_ready", "idx": idx, "total": total})
+    logger.info("[%d/%d] Diagram JSON ready", idx, total)
+    await sink.drain()
+    _zip_put(zf, prefix + "diagram.json", orjson.dumps(diagram_json, option=orjson.OPT_INDENT_2))
+    if assignment_id is not None:
+        await asyncio.to_thread(set_diagram_context, assignment_id, idx - 1, diagram_json)
+
+    logger.info("[%d/%d] Generating narration scripts", idx, total)
+    eng_script, urd_script = await _english_and_urdu_scripts(diagram_json)
+    emit_progress({"status": "scripts_ready", "idx": idx, "total": total})
+    logger.info("[%d/%d] Scripts generated", idx, total)
+    await sink.drain()
+    _zip_put(zf, prefix + "script_en.txt", eng_script)
+    _zip_put(zf, prefix + "script_ur.txt", urd_script)
+
+    emit_progress({"status": "braille_ready", "idx": idx, "total": total})
+    logger.info("[%d/%d] Converting scripts to braille", idx, total)
+    braille_en, braille_ur = await _text_to_braille_both(eng_script, urd_script)
+    await sink.drain()
+    _zip_put(zf, prefix + "braille_en.txt", braille_en)
+    _zip_put(zf, prefix + "braille_ur.txt", braille_ur)
+
+    svg_en, svg_ur = await asyncio.to_thread(
+        lambda: (_braille_to_svg(braille_en), _braille_to_svg(braille_ur))
+    )
+    await sink.drain()
+    _zip_put(zf, prefix + "braille_en.svg", svg_en)
+    _zip_put(zf, prefix + "braille_ur.svg", svg_ur)
+
+    emit_progress({"status": "audio_ready", "idx": idx, "total": total})
+    logger.info("[%d/%d] Generating English audio via TTS", idx, total)
+    # pyttsx3 can only render to a path, so stage the WAV and move it into the pack
+    wav_path = tmpdir / f"audio_en_{idx}.wav"
+    await synthesize_async(eng_script, wav_path)
+    await sink.drain()
+    await _zip_file(zf, prefix + "audio_en.wav", wav_path)
+    wav_path.unlink(missing_ok=True)
+
+
+# Bytes of zip output allowed to wait for a slow client before items pause
+_STREAM_HIGH_WATER = 4 * 1024 * 1024
+
+
+class _ZipStreamSink:
+    """Unseekable file object that hands each zip write to an asyncio queue.
+
+    ``zipfile`` falls back to data descriptors when it can't ``tell()``, so
+    entries can be sent to the client as soon as they are written. Writes
+    happen on the event loop thread only. ``zipfile`` writes synchronously, so
+    backpressure is applied by writers awaiting :meth:`drain` beforehand; it
+    only kicks in once :meth:`start` says a client is reading.
+    """
+
+    def __init__(self, queue: asyncio.Queue, high_water: int = _STREAM_HIGH_WATER):
+        self._queue = queue
+        self._high_water = high_water
+        self._buffered = 0
+        self._streaming = False
+        self._aborted = False
+        self._below_high_water = asyncio.Event()
+        self._below_high_water.set()
+
+    def write(self, data) -> int:
+        if self._aborted:
+            return len(data)
+        data = bytes(data)
+        self._queue.put_nowait(data)
+        self._buffered += len(data)
+        self._update()
+        return len(data)
+
+    def _update(self):
+        if self._streaming and self._buffered > self._high_water:
+            self._below_high_water.clear()
+        else:
+            self._below_high_water.set()
+
+    def start(self):
+        """Begin applying backpressure; the client is now draining the queue."""
+        self._streaming = True
+        self._update()
+
+    def abort(self):
+        """Discard all further writes, e.g. the central directory of a failed pack."""
+        self._aborted = True
+        self._below_high_water.set()
+
+    def sent(self, nbytes: int):
+        """Record that *nbytes* queued bytes reached the client."""
+        self._buffered -= nbytes
+        self._update()
+
+    async def drain(self):
+        """Wait until the unsent backlog is back under the high-water mark."""
+        await self._below_high_water.wait()
+
+    def flush(self):
+        pass
+
+
+async def stream_lesson_pack(pairs: List[Tuple[Path, str]],
+                             assignment_id: int | None = None) -> AsyncIterator[bytes]:
+    """Generate a lesson pack, yielding the zip's bytes as entries are added.
+
+    ``pairs = [(image_path, question_prompt), ...]``. Logging at INFO level
+    provides progress feedback in the server logs.
+
+    Nothing is yielded until the first item is complete, so a failure up to
+    that point raises from the first ``__anext__`` and the caller can still
+    answer with an HTTP error. A later failure emits an ``error`` progress
+    event and raises mid-stream; the archive is abandoned without a central
+    directory, so a partial pack never looks complete.
     """
     total = len(pairs)
     emit_progress({"status": "starting", "total": total})
     logger.info("Starting lesson pack generation (%d items)", total)
-    """pairs = [(image_path, question_prompt), ...]"""
+    # Only staging for TTS output now; the pack itself never touches disk
     tmpdir = Path(tempfile.mkdtemp())
-
-    for idx, (img_path, prompt) in enumerate(pairs, start=1):
-        emit_progress({"status": "processing", "idx": idx, "total": total, "filename": img_path.name})
-        logger.info("[%d/%d] Processing image: %s", idx, total, img_path.name)
-        await asyncio.sleep(0)
-        item_dir = tmpdir / f"item_{idx}"
-        item_dir.mkdir(parents=True, exist_ok=True)
-        shutil.copy(img_path, item_dir / img_path.name)
-        (item_dir / "question.txt").write_text(prompt, encoding="utf-8")
-
-        logger.info("[%d/%d] Extracting diagram data", idx, len(pairs))
-        await asyncio.sleep(0)
-        diagram_json = await _diagram_json_from_image(img_path)
-        emit_progress({"status": "diagram_ready", "idx": idx, "total": total})
-        logger.info("[%d/%d] Diagram JSON ready", idx, total)
-        (item_dir / "diagram.json").write_text(json.dumps(diagram_json, ensure_ascii=False, indent=2))
-        if assignment_id is not None:
-            set_diagram_context(assignment_id, idx - 1, json.dumps(diagram_json, ensure_ascii=False))
-
-        logger.info("[%d/%d] Generating narration scripts", idx, len(pairs))
-        await asyncio.sleep(0)
-        eng_script, urd_script = await _english_and_urdu_scripts(diagram_json)
-        emit_progress({"status": "scripts_ready", "idx": idx, "total": total})
-        logger.info("[%d/%d] Scripts generated", idx, total)
-        (item_dir / "script_en.txt").write_text(eng_script, encoding="utf-8")
-        (item_dir / "script_ur.txt").write_text(urd_script, encoding="utf-8")
-
-        emit_progress({"status": "braille_ready", "idx": idx, "total": total})
-        logger.info("[%d/%d] Converting scripts to braille", idx, total)
-        await asyncio.sleep(0)
-        braille_en = _text_to_braille(eng_script, "english")
-        braille_ur = _text_to_braille(urd_script, "urdu")
-        (item_dir / "braille_en.txt").write_text(braille_en, encoding="utf-8")
-        (item_dir / "braille_ur.txt").write_text(braille_ur, encoding="utf-8")
-
-        _braille_to_svg(braille_en, item_dir / "braille_en.svg")
-        _braille_to_svg(braille_ur, item_dir / "braille_ur.svg")
-
-        emit_progress({"status": "audio_ready", "idx": idx, "total": total})
-        logger.info("[%d/%d] Generating English audio via TTS", idx, total)
-        await asyncio.sleep(0)
-        # Generate English audio via TTS service
-        synthesize(eng_script, item_dir / "audio_en.wav")
-
-    # Zip pack
-    zip_path = tmpdir / "lesson_pack.zip"
-    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
-        for file in tmpdir.rglob("*"):
-            if file == zip_path:
-                continue
-            zf.write(file, file.relative_to(tmpdir))
-    emit_progress({"status": "finished", "download": str(zip_path)})
-    logger.info("Lesson pack ready: %s", zip_path)
-    await asyncio.sleep(0)
-    return zip_path
+    chunks: asyncio.Queue = asyncio.Queue()
+    sink = _ZipStreamSink(chunks)
+    sem = asyncio.Semaphore(_ITEM_CONCURRENCY)
+    first_item_done = asyncio.Event()
+
+    async def _bounded(idx: int, img_path: Path, prompt: str, zf: zipfile.ZipFile):
+        async with sem:
+            await _process_item(idx, img_path, prompt, zf, sink, tmpdir, total, assignment_id)
+        first_item_done.set()
+
+    async def _build():
+        zf = zipfile.ZipFile(sink, "w")
+        tasks = [asyncio.create_task(_bounded(idx, img_path, prompt, zf))
+                 for idx, (img_path, prompt) in enumerate(pairs, start=1)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # gather doesn't stop the siblings of a failed item; cancel
+            # them so they neither keep the models busy nor write to
+            # the zip after it is closed
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # Leave the archive unfinished rather than close it as if valid
+            sink.abort()
+            raise
+        finally:
+            zf.close()
+            chunks.put_nowait(None)
+
+    build = asyncio.create_task(_build())
+    try:
+        first_done = asyncio.create_task(first_item_done.wait())
+        await asyncio.wait({build, first_done}, return_when=asyncio.FIRST_COMPLETED)
+        first_done.cancel()
+        if build.done():
+            build.result()  # failed before anything was sent: raise to the caller
+        sink.start()
+        while (chunk := await chunks.get()) is not None:
+            yield chunk
+            sink.sent(len(chunk))
+        await build  # surface a failed item instead of ending the stream quietly
+    except Exception as e:
+        logger.exception("Lesson pack generation failed")
+        emit_progress({"status": "error", "detail": str(e)})
+        raise
+    finally:
+        # Client went away or an item failed: stop outstanding work
+        build.cancel()
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    emit_progress({"status": "finished"})
+    logger.info("Lesson pack streamed (%d items)", total)
@@ -0,0 +1,59 @@
+"""
+Shared Ollama client for every text-LLM call in the backend.
+"""
+
+import asyncio
+import logging
+import os
+import random
+
+import httpx
+from ollama import AsyncClient, ChatResponse, ResponseError
+
+logger = logging.getLogger(__name__)
+
+# Model used for all text generation
+LLM_MODEL = "gemma3n:e2b"
+
+# Read timeout for a chat, in seconds. It also covers time queued inside
+# Ollama and cold model loads, so the default is generous; 0 disables it.
+_OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "600")) or None
+
+# One keep-alive pool for every Ollama request (host still comes from
+# OLLAMA_HOST); generation can be slow, connecting should not be.
+ollama_client = AsyncClient(
+    timeout=httpx.Timeout(_OLLAMA_TIMEOUT, connect=2.0),
+    limits=httpx.Limits(max_connections=8, max_keepalive_connections=8),
+)
+# Caps chats in flight so concurrent requests don't swamp the server
+_OLLAMA_CONCURRENCY = 4
+_ollama_sem = asyncio.Semaphore(_OLLAMA_CONCURRENCY)
+_OLLAMA_RETRIES = 3
+
+
+async def chat(**kwargs) -> ChatResponse:
+    """Bounded ``ollama_client.chat`` that retries 5xx responses with jittered backoff.
+
+    Parameters
+    ----------
+    **kwargs
+        Passed through to :meth:`ollama.AsyncClient.chat`; ``model`` defaults
+        to :data:`LLM_MODEL`.
+
+    Returns
+    -------
+    ChatResponse
+        The Ollama response.
+    """
+    kwargs.setdefault("model", LLM_MODEL)
+    for attempt in range(_OLLAMA_RETRIES):
+        try:
+            async with _ollama_sem:
+                return await ollama_client.chat(**kwargs)
+        except ResponseError as e:
+            if e.status_code < 500 or attempt == _OLLAMA_RETRIES - 1:
+                raise
+            delay = 0.5 * 2 ** attempt * (1 + random.random())
+            logger.warning("Ollama returned %s, retrying in %.1fs", e.status_code, delay)
+        # Back off without holding a slot other chats could use
+        await asyncio.sleep(delay)
@@ -1,29 +1,65 @@
 import asyncio
-from typing import Dict, Any, List
+from typing import Dict, Any, Set, Tuple
 
-# List of queues for connected SSE clients
-_listeners: List[asyncio.Queue[Dict[str, Any]]] = []
+import orjson
 
+# Queues for connected SSE clients (hashable by identity). They carry ready
+# SSE frames, so each event is serialised once however many clients listen.
+_listeners: Set[asyncio.Queue] = set()
 
-def register_listener() -> asyncio.Queue:  # Queue[Dict[str, Any]]
-    """Return a new queue and add it to the listener list."""
-    q: asyncio.Queue = asyncio.Queue()
-    _listeners.append(q)  # type: ignore[arg-type]
+# Latest event per (status, idx) channel, drained to listeners by a single pump
+# task. Bursts of events on the same channel collapse into the most recent one;
+# items processed concurrently keep their own events.
+_COALESCE_INTERVAL = 0.05  # seconds
+# Per-listener backlog; a slow client loses its oldest events, never the newest
+_QUEUE_MAXSIZE = 64
+_latest: Dict[Tuple[str, Any], Dict[str, Any]] = {}
+_dirty = asyncio.Event()
+_pump_task: asyncio.Task | None = None
+
+
+async def _pump():
+    """Fan out coalesced events to every listener at a capped rate."""
+    while True:
+        await _dirty.wait()
+        # Give a burst of pushes a moment to collapse before draining
+        await asyncio.sleep(_COALESCE_INTERVAL)
+        _dirty.clear()
+        batch = [b"data: " + orjson.dumps(event) + b"\n\n" for event in _latest.values()]
+        _latest.clear()
+        for q in tuple(_listeners):
+            for event in batch:
+                try:
+                    q.put_nowait(event)
+                except asyncio.QueueFull:
+                    # Drop the oldest event to make room for the latest
+                    try:
+                        q.get_nowait()
+                        q.put_nowait(event)
+                    except (asyncio.QueueEmpty, asyncio.QueueFull):
+                        pass
+
+
+def register_listener() -> asyncio.Queue:  # Queue[bytes]
+    """Return a new queue and add it to the listener set."""
+    global _pump_task
+    q: asyncio.Queue = asyncio.Queue(maxsize=_QUEUE_MAXSIZE)
+    _listeners.add(q)
+    if _pump_task is None or _pump_task.done():
+        _pump_task = asyncio.get_running_loop().create_task(_pump())
     return q
 
 
 def remove_listener(q: asyncio.Queue):
-    try:
-        _listeners.remove(q)  # type: ignore[arg-type]
-    except ValueError:
-        pass
+    _listeners.discard(q)
 
 
 def push(event: Dict[str, Any]):
-    """Push an event to all listening queues without blocking."""
-    for q in list(_listeners):
-        try:
-            q.put_nowait(event)
-        except asyncio.QueueFull:
-            # uncommon; skip if queue can't accept more msgs
-            pass
+    """Record *event* as the latest on its channel and wake the pump."""
+    if not _listeners:
+        return
+    key = (event.get("status", "default"), event.get("idx"))
+    # Re-insert so channels drain in the order they were last updated
+    _latest.pop(key, None)
+    _latest[key] = event
+    _dirty.set()
@@ -1,10 +1,34 @@
+import asyncio
 import time
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Union
 
 import pyttsx3
 
+# Process-wide engine; driver start-up is expensive. Some drivers (NSSS on
+# macOS, SAPI5 over COM) are bound to the thread that created the engine, so
+# the engine is created and driven on one dedicated thread only, which also
+# serialises requests.
+_engine = None
+_tts_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts")
+_current_voice: str | None = None
+
+
+def _get_engine():
+    """Return the shared pyttsx3 engine, initialising it on first use.
+
+    Must be called on ``_tts_executor``'s thread.
+    """
+    global _engine
+    if _engine is None:
+        _engine = pyttsx3.init()
+        # Set properties for better quality
+        _engine.setProperty('rate', 150)    # Speed of speech
+        _engine.setProperty('volume', 0.9)  # Volume level (0.0 to 1.0)
+    return _engine
+
 
 def preload_tts_model():
     """Explicitly preload the TTS model.
@@ -13,41 +37,27 @@ def preload_tts_model():
     startup event. The function is idempotent – repeated calls are no-ops
     after the first successful load.
     """
-    # pyttsx3 doesn't require preloading, but we keep the interface consistent
-    return None
+    return _tts_executor.submit(_get_engine).result()
 
 
-def synthesize(text: str, out_path: Union[str, Path], *, voice: str | None = None):
-    """Convert *text* to speech and write a WAV file to *out_path*.
+def _synthesize(text: str, out_path: Union[str, Path], voice: str | None = None):
+    """Body of :func:`synthesize`; runs on ``_tts_executor``'s thread."""
+    global _current_voice
 
-    Parameters
-    ----------
-    text : str
-        The text to synthesise.
-    out_path : Union[str, pathlib.Path]
-        Destination path for the generated WAV audio.
-    voice : str, optional
-        Override voice for multi-speaker models. When omitted the default
-        voice bundled with the checkpoint is used.
-    """
     if isinstance(out_path, Path):
         out_path = str(out_path)
 
-    # Initialize pyttsx3 engine
-    engine = pyttsx3.init()
-    
-    # Configure voice if specified
-    if voice:
+    engine = _get_engine()
+
+    # Configure voice if specified and different from the last request
+    if voice and voice != _current_voice:
         voices = engine.getProperty('voices')
         for v in voices:
             if voice.lower() in v.name.lower() or voice.lower() in v.id.lower():
                 engine.setProperty('voice', v.id)
+                _current_voice = voice
                 break
-    
-    # Set properties for better quality
-    engine.setProperty('rate', 150)    # Speed of speech
-    engine.setProperty('volume', 0.9)  # Volume level (0.0 to 1.0)
-    
+
     # Run inference
     begin = time.time()
     engine.save_to_file(text, out_path)
@@ -56,3 +66,25 @@ def synthesize(text: str, out_path: Union[str, Path], *, voice: str | None = Non
 
     print(f"[TTS pyttsx3] Wrote {out_path} in {inference_time:.2f}s")
     return Path(out_path)
+
+
+def synthesize(text: str, out_path: Union[str, Path], *, voice: str | None = None):
+    """Convert *text* to speech and write a WAV file to *out_path*.
+
+    Parameters
+    ----------
+    text : str
+        The text to synthesise.
+    out_path : Union[str, pathlib.Path]
+        Destination path for the generated WAV audio.
+    voice : str, optional
+        Override voice for multi-speaker models. When omitted the default
+        voice bundled with the checkpoint is used.
+    """
+    return _tts_executor.submit(_synthesize, text, out_path, voice).result()
+
+
+async def synthesize_async(text: str, out_path: Union[str, Path], *, voice: str | None = None):
+    """Run :func:`synthesize` on the TTS thread so the event loop stays free."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_tts_executor, _synthesize, text, out_path, voice)
@@ -3,13 +3,42 @@
 
 from ultralytics import YOLO
 from app.services.braille_decoder import BrailleDecoder
-from typing import List, Tuple
+from typing import Iterator, List, Tuple
+import functools
+import itertools
+import os
 import pathlib
+import numpy as np
+import torch
 from PIL import Image, ImageDraw, ImageFont
-import matplotlib.pyplot as plt
+
+_IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff'}
+
+# Outline colors cycled by class ID in the debug overlay
+_CLASS_COLORS = ('red', 'blue', 'green', 'orange', 'purple', 'yellow', 'cyan', 'magenta')
+
+
+@functools.lru_cache(maxsize=4)
+def _get_font(name: str, size: int) -> ImageFont.ImageFont:
+    """Resolve a TrueType font once, falling back to PIL's default font."""
+    try:
+        return ImageFont.truetype(name, size)
+    except (OSError, IOError):
+        return ImageFont.load_default()
+
+
+def _iter_images(input_dir: str) -> Iterator[str]:
+    """Lazily yield image file paths in *input_dir* using cached DirEntry info."""
+    with os.scandir(input_dir) as it:
+        for entry in it:
+            if (os.path.splitext(entry.name)[1].lower() in _IMAGE_EXTENSIONS
+                    and entry.is_file()):
+                yield entry.path
+
 
 class YOLOBrailleReader:
-    def __init__(self, model_path: str, confidence_threshold: float = 0.5, imgsz: int = 1280):
+    def __init__(self, model_path: str, confidence_threshold: float = 0.5, imgsz: int = 1280,
+                 batch_size: int | None = None, use_onnx: bool = False):
         """
         Initialize YOLO Braille reader.
         
@@ -17,59 +46,58 @@ class YOLOBrailleReader:
             model_path: Path to trained YOLO model
             confidence_threshold: Minimum confidence for detections
             imgsz: Input image size (should match training configuration)
+            batch_size: Images per forward pass in process_directory
+                (defaults to 8 on GPU, 1 on CPU)
+            use_onnx: Run the model through ONNX Runtime, exporting a fused
+                graph next to the .pt file on first use
         """
-        self.model = YOLO(model_path)
+        if use_onnx:
+            model_path = self._onnx_model(model_path, imgsz)
+        self.model = YOLO(model_path, task="detect")
         self.confidence_threshold = confidence_threshold
         self.imgsz = imgsz
+        if batch_size is None:
+            batch_size = 8 if torch.cuda.is_available() else 1
+        self.batch_size = max(1, batch_size)
         self.decoder = BrailleDecoder()
         
-    def preprocess_image(self, image_path: str) -> Image.Image:
+    @staticmethod
+    def _onnx_model(model_path: str, imgsz: int) -> str:
         """
-        Preprocess image to match training conditions.
+        Return the path of an ONNX export of *model_path*, exporting if needed.
+        
+        The export is refreshed whenever the .pt file is newer. Ultralytics
+        runs the exported graph with ONNX Runtime (CUDA provider when present)
+        behind the same predict API.
         
         Args:
-            image_path: Path to input image
+            model_path: Path to trained YOLO .pt model
+            imgsz: Input image size baked into the graph
             
         Returns:
-            Preprocessed PIL Image
+            Path to the .onnx file
         """
-        # Load image
-        img = Image.open(image_path).convert('RGB')
-        
-        # Resize to match training size (1280x1280)
-        # Use letterboxing to maintain aspect ratio
-        img_ratio = img.width / img.height
-        target_ratio = 1.0  # Square target
-        
-        if img_ratio > target_ratio:
-            # Image is wider than target
-            new_width = self.imgsz
-            new_height = int(self.imgsz / img_ratio)
-        else:
-            # Image is taller than target
-            new_height = self.imgsz
-            new_width = int(self.imgsz * img_ratio)
-        
-        # Resize maintaining aspect ratio
-        img_resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-        
-        # Create square canvas with padding
-        canvas = Image.new('RGB', (self.imgsz, self.imgsz), (238, 238, 238))  # Same paper color as training
-        
-        # Center the resized image on the canvas
-        x_offset = (self.imgsz - new_width) // 2
-        y_offset = (self.imgsz - new_height) // 2
-        canvas.paste(img_resized, (x_offset, y_offset))
-        
-        return canvas
+        pt_path = pathlib.Path(model_path)
+        onnx_path = pt_path.with_suffix('.onnx')
+        if not onnx_path.exists() or onnx_path.stat().st_mtime < pt_path.stat().st_mtime:
+            # Dynamic batch axis so request batches of any size hit the same
+            # graph; FP16 only where a GPU can run it
+            YOLO(model_path).export(
+                format='onnx',
+                imgsz=imgsz,
+                dynamic=True,
+                simplify=True,
+                half=torch.cuda.is_available(),
+            )
+        return str(onnx_path)
     
-    def draw_detections_on_image(self, img: Image.Image, detections: List[Tuple[int, float, float, float]]) -> Image.Image:
+    def draw_detections_on_image(self, img: Image.Image, detections: Tuple[np.ndarray, ...]) -> Image.Image:
         """
         Draw bounding boxes on image based on YOLO detections.
         
         Args:
             img: PIL Image
-            detections: List of (class_id, x_center_norm, y_center_norm, confidence)
+            detections: (class_ids, x_center_norm, y_center_norm, confidence) arrays
             
         Returns:
             PIL Image with bounding boxes drawn
@@ -77,15 +105,10 @@ class YOLOBrailleReader:
         img_with_boxes = img.copy()
         draw = ImageDraw.Draw(img_with_boxes)
         
-        # Colors for different classes
-        colors = ['red', 'blue', 'green', 'orange', 'purple', 'yellow', 'cyan', 'magenta']
-        
-        try:
-            font = ImageFont.truetype("Arial.ttf", 12)
-        except (OSError, IOError):
-            font = ImageFont.load_default()
+        colors = _CLASS_COLORS
+        font = _get_font("Arial.ttf", 12)
         
-        for class_id, x_center_norm, y_center_norm, confidence in detections:
+        for class_id, x_center_norm, y_center_norm, confidence in zip(*(a.tolist() for a in detections)):
             # Convert normalized coordinates to pixel coordinates
             x_center = x_center_norm * img.width
             y_center = y_center_norm * img.height
@@ -116,7 +139,7 @@ class YOLOBrailleReader:
         
         return img_with_boxes
         
-    def extract_detections(self, results) -> List[Tuple[int, float, float, float]]:
+    def extract_detections(self, results) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
         """
         Extract relevant detection data from YOLO results.
         
@@ -124,24 +147,31 @@ class YOLOBrailleReader:
             results: YOLO results object
             
         Returns:
-            List of (class_id, x_center_norm, y_center_norm, confidence) tuples
+            Tuple of (class_ids, x_center_norm, y_center_norm, confidence) arrays
         """
-        detections = []
+        cls_parts, x_parts, y_parts, conf_parts = [], [], [], []
         
         for result in results:
             boxes = result.boxes
-            if boxes is not None:
-                for i in range(len(boxes)):
-                    # Get normalized coordinates (already in 0-1 range)
-                    x_center_norm = float(boxes.xywhn[i][0])
-                    y_center_norm = float(boxes.xywhn[i][1])
-                    confidence = float(boxes.conf[i])
-                    class_id = int(boxes.cls[i])
-                    
-                    if confidence >= self.confidence_threshold:
-                        detections.append((class_id, x_center_norm, y_center_norm, confidence))
-        
-        return detections
+            if boxes is None or len(boxes) == 0:
+                continue
+            # One device->host transfer per tensor instead of one per scalar
+            xywhn = boxes.xywhn.cpu().numpy()
+            conf = boxes.conf.cpu().numpy()
+            cls = boxes.cls.cpu().numpy().astype(np.int16)
+            
+            mask = conf >= self.confidence_threshold
+            cls_parts.append(cls[mask])
+            x_parts.append(xywhn[mask, 0])
+            y_parts.append(xywhn[mask, 1])
+            conf_parts.append(conf[mask])
+        
+        if not cls_parts:
+            empty = np.empty(0, dtype=np.float32)
+            return np.empty(0, dtype=np.int16), empty, empty, empty
+        
+        return (np.concatenate(cls_parts), np.concatenate(x_parts),
+                np.concatenate(y_parts), np.concatenate(conf_parts))
     
     def predict_and_decode(self, 
                           image_path: str,
@@ -158,47 +188,79 @@ class YOLOBrailleReader:
         Returns:
             Tuple of (braille_lines, urdu_lines)
         """
-        # Preprocess image to match training conditions
-        preprocessed_img = self.preprocess_image(image_path)
-        
         if show_intermediate:
             print(f"Original image size: {Image.open(image_path).size}")
-            print(f"Preprocessed image size: {preprocessed_img.size}")
         
-        # Run YOLO inference on preprocessed image
-        results = self.model(preprocessed_img)
+        # Ultralytics letterboxes to imgsz internally and filters by conf,
+        # so the raw path goes straight in
+        results = self.model(
+            image_path,
+            imgsz=self.imgsz,
+            conf=self.confidence_threshold,
+            verbose=False,
+        )
         
         # Extract detections
         detections = self.extract_detections(results)
+        class_ids, xs, ys, confs = detections
         
         if show_intermediate:
-            print(f"Found {len(detections)} detections above confidence threshold")
+            print(f"Found {len(class_ids)} detections above confidence threshold")
             print("Sample detections (class_id, x, y, conf):")
-            for det in detections[:5]:  # Show first 5
+            for det in zip(*(a[:5].tolist() for a in detections)):  # Show first 5
                 print(f"  {det}")
-            if len(detections) > 5:
-                print(f"  ... and {len(detections) - 5} more")
+            if len(class_ids) > 5:
+                print(f"  ... and {len(class_ids) - 5} more")
             
             # Display image with bounding boxes
-            if detections:
-                img_with_boxes = self.draw_detections_on_image(preprocessed_img, detections)
+            if len(class_ids):
+                # Debug-only; keep matplotlib out of server start-up
+                import matplotlib.pyplot as plt
+                
+                # Box coordinates are normalised to the original image
+                original = Image.open(image_path).convert('RGB')
+                img_with_boxes = self.draw_detections_on_image(original, detections)
                 plt.figure(figsize=(12, 8))
                 plt.imshow(img_with_boxes)
-                plt.title(f"Detected {len(detections)} braille characters")
+                plt.title(f"Detected {len(class_ids)} braille characters")
                 plt.axis('off')
                 plt.show()
         
-        # Convert to format needed by decoder (remove confidence)
-        detection_positions = [(class_id, x, y) for class_id, x, y, conf in detections]
-        
-        # Decode to text
-        braille_lines, urdu_lines = self.decoder.decode_from_detections(
-            detection_positions, 
+        # Decode to text straight from the detection arrays
+        braille_lines, urdu_lines = self.decoder.decode_from_arrays(
+            class_ids, xs, ys,
             line_height_threshold
         )
         
         return braille_lines, urdu_lines
     
+    def _decode_result(self, result, line_height_threshold: float = 0.05) -> Tuple[List[str], List[str]]:
+        """Decode a single Ultralytics result to (braille_lines, urdu_lines)."""
+        class_ids, xs, ys, _ = self.extract_detections([result])
+        return self.decoder.decode_from_arrays(class_ids, xs, ys, line_height_threshold)
+    
+    def predict_and_decode_batch(self,
+                                 image_paths: List[str],
+                                 line_height_threshold: float = 0.05) -> List[Tuple[List[str], List[str]]]:
+        """
+        Run YOLO on several images in one forward pass and decode each.
+        
+        Args:
+            image_paths: Paths to input images
+            line_height_threshold: Threshold for separating text lines
+            
+        Returns:
+            One (braille_lines, urdu_lines) tuple per image, in input order
+        """
+        results = self.model(
+            list(image_paths),
+            imgsz=self.imgsz,
+            conf=self.confidence_threshold,
+            batch=len(image_paths),
+            verbose=False,
+        )
+        return [self._decode_result(result, line_height_threshold) for result in results]
+    
     def process_image(self, image_path: str, verbose: bool = False) -> str:
         """
         Process a single image and return the recognized Urdu text.
@@ -238,36 +300,51 @@ class YOLOBrailleReader:
             input_dir: Directory containing input images
             output_dir: Directory to save text files (optional)
         """
-        input_path = pathlib.Path(input_dir)
-        
         if output_dir:
             output_path = pathlib.Path(output_dir)
             output_path.mkdir(parents=True, exist_ok=True)
         
-        # Find all image files
-        image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff'}
-        image_files = [f for f in input_path.glob('*') 
-                      if f.suffix.lower() in image_extensions]
-        
-        print(f"Found {len(image_files)} images in {input_dir}")
+        # Stream image paths and pull them in fixed-size batches
+        image_files = _iter_images(input_dir)
+        processed = 0
         
-        for image_file in image_files:
-            print(f"\n{'='*50}")
+        while batch := list(itertools.islice(image_files, self.batch_size)):
+            processed += len(batch)
             
             try:
-                urdu_text = self.process_image(str(image_file))
-                
-                if output_dir:
-                    # Save text to file
-                    text_file = output_path / f"{image_file.stem}.txt"
-                    with open(text_file, 'w', encoding='utf-8') as f:
-                        f.write(urdu_text)
-                    print(f"Saved text to: {text_file}")
-                else:
-                    print(f"[{image_file.stem}] Urdu text: {urdu_text}")
-                
+                # One forward pass per batch amortises pre/post-processing and NMS setup
+                results = self.model(
+                    batch,
+                    imgsz=self.imgsz,
+                    conf=self.confidence_threshold,
+                    batch=self.batch_size,
+                    verbose=False,
+                )
             except Exception as e:
-                print(f"Error processing {image_file}: {e}")
+                print(f"Error processing batch starting at {batch[0]}: {e}")
+                continue
+            
+            for image_file, result in zip(batch, results):
+                stem = pathlib.Path(image_file).stem
+                print(f"\n{'='*50}")
+                
+                try:
+                    _, urdu_lines = self._decode_result(result)
+                    urdu_text = "\n".join(urdu_lines)
+                    
+                    if output_dir:
+                        # Save text to file
+                        text_file = output_path / f"{stem}.txt"
+                        with open(text_file, 'w', encoding='utf-8') as f:
+                            f.write(urdu_text)
+                        print(f"Saved text to: {text_file}")
+                    else:
+                        print(f"[{stem}] Urdu text: {urdu_text}")
+                    
+                except Exception as e:
+                    print(f"Error processing {image_file}: {e}")
+        
+        print(f"Processed {processed} images in {input_dir}")
 
 
 def main():
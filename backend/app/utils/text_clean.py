@@ -1,9 +1,14 @@
 """Utility functions for preparing Urdu text before Braille conversion."""
-import re
 
-# Regex that matches ASCII letters, digits and common punctuation which we want to drop
-# Added backslash to the character class, but keep Urdu question mark ؟
-_DROP_PUNCT = re.compile(r"[A-Za-z0-9_\\\-~`!@#$%^&*()\[\]{};:\"',.<>/|]+")
+# ASCII letters, digits and common punctuation which we want to drop
+# Backslash included, but keep Urdu question mark ؟
+_DROP_CHARS = (
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+    "_\\-~`!@#$%^&*()[]{};:\"',.<>/|"
+)
+# One C-level pass: dropped characters become spaces (collapsed below) and the
+# ASCII question mark becomes the Urdu one
+_CLEAN_TABLE = str.maketrans({**dict.fromkeys(_DROP_CHARS, " "), "?": "؟"})
 
 def clean_source(text: str) -> str:
     """Return *text* with ASCII / punctuation removed and whitespace normalised.
@@ -11,11 +16,7 @@ def clean_source(text: str) -> str:
     This prevents liblouis from outputting 8-dot Braille patterns for
     characters that are outside the Urdu alphabet (e.g. '-' ↦ ⡳).
     """
-    # Replace ASCII question mark with Urdu question mark
-    text = text.replace('?', '؟')
-    
-    # Remove unwanted characters
-    text = _DROP_PUNCT.sub(" ", text)
-    # Collapse consecutive whitespace to a single space
-    text = re.sub(r"\s+", " ", text)
-    return text.strip()
+    # Replace ASCII question mark with Urdu question mark, remove unwanted characters
+    text = text.translate(_CLEAN_TABLE)
+    # Collapse consecutive whitespace to a single space (and strip the ends)
+    return " ".join(text.split())
@@ -6,9 +6,132 @@ from PIL import Image, ImageDraw, ImageFilter, ImageChops, ImageOps, ImageEnhanc
 import random, numpy as np
 from io import BytesIO
 
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional; the NumPy/PIL paths below are used instead
+    njit = None
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB, TJSAMP_420
+    _TJ = TurboJPEG()
+except Exception:  # package or libturbojpeg missing; PhotoAug.jpeg uses PIL
+    _TJ = None
+
 UNICODE_BRAILLE_BASE = 0x2800
 NUM_CLASSES = 64  # Braille 0–63 (6-dot)
 
+# Every draw PhotoAug makes comes from these two; see seed_augmentations()
+_random = random.Random()
+_rng = np.random.default_rng()
+
+# Squared radial falloff per page size, (normal, inverted); FIFO-bounded
+_VIG_CACHE = {}
+_VIG_CACHE_SIZE = 16
+
+
+def _vignette_falloff(w, h):
+    key = (w, h)
+    if key not in _VIG_CACHE:
+        y, x = np.ogrid[-1:1:h*1j, -1:1:w*1j]
+        d = np.sqrt(x*x + y*y)
+        d = d / d.max()
+        if len(_VIG_CACHE) >= _VIG_CACHE_SIZE:
+            del _VIG_CACHE[next(iter(_VIG_CACHE))]
+        _VIG_CACHE[key] = (d**2, (1 - d)**2)
+    return _VIG_CACHE[key]
+
+
+# Page-sized linear gradient per page size, rotated per call; FIFO-bounded
+_GRAD_CACHE = {}
+_GRAD_CACHE_SIZE = 16
+
+
+def _gradient_template(w, h):
+    key = (w, h)
+    if key not in _GRAD_CACHE:
+        if len(_GRAD_CACHE) >= _GRAD_CACHE_SIZE:
+            del _GRAD_CACHE[next(iter(_GRAD_CACHE))]
+        _GRAD_CACHE[key] = Image.linear_gradient("L").resize((w, h))
+    return _GRAD_CACHE[key]
+
+
+# Single-pass versions of the elementwise augmentations: one sweep over the
+# uint8 RGB array instead of several full-size NumPy/PIL temporaries.
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _vignette_kernel(arr, d2, f, scale):
+        h, w, c = arr.shape
+        out = np.empty_like(arr)
+        keep = 1.0 - f * 0.7
+        for i in prange(h):
+            for j in range(w):
+                a = min(d2[i, j] * f, 1.0) * scale
+                a = np.floor(a * 255.0) / 255.0
+                for k in range(c):
+                    v = np.float64(arr[i, j, k])
+                    dark = np.floor(v * keep + 0.5)
+                    out[i, j, k] = np.uint8(np.floor(dark + (v - dark) * a + 0.5))
+        return out
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _focus_drop_kernel(arr, blur):
+        h, w, c = arr.shape
+        out = np.empty_like(arr)
+        for i in prange(h):
+            a = np.floor(255.0 - 255.0 * i / max(h - 1, 1)) / 255.0
+            for j in range(w):
+                for k in range(c):
+                    v = np.float64(arr[i, j, k])
+                    out[i, j, k] = np.uint8(np.floor(v + (blur[i, j, k] - v) * a + 0.5))
+        return out
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _noise_kernel(arr, sigma, seed):
+        h, w, c = arr.shape
+        out = np.empty_like(arr)
+        for i in prange(h):
+            # numba's generator state is per thread, so seed each row: the
+            # noise then doesn't depend on which thread ran which row
+            np.random.seed(seed + i)
+            for j in range(w):
+                for k in range(c):
+                    v = arr[i, j, k] + np.random.normal(0.0, sigma)
+                    out[i, j, k] = np.uint8(min(max(v, 0.0), 255.0))
+        return out
+
+
+def seed_augmentations(seed):
+    """Reseed the generators behind PhotoAug, e.g. once per worker process."""
+    global _rng
+    _random.seed(seed)
+    _rng = np.random.default_rng(seed)
+
+
+def save_jpeg(img, path, quality=75):
+    """Write *img* as a JPEG, through libjpeg-turbo directly when it is available.
+
+    *quality* and 4:2:0 chroma subsampling are PIL's defaults, so the encoder
+    settings match ``img.save(path)`` (turbojpeg itself defaults to 4:2:2).
+    """
+    if _TJ is not None and img.mode == "RGB":
+        with open(path, "wb") as f:
+            f.write(_TJ.encode(np.asarray(img), quality=quality, pixel_format=TJPF_RGB,
+                               jpeg_subsample=TJSAMP_420))
+    else:
+        img.save(path, "JPEG", quality=quality)
+
+
+class _BrailleOnlyTable(dict):
+    """``str.translate`` table sending every code point outside the 6-dot
+    block (spaces included) to the blank cell; entries fill in on first use."""
+
+    def __missing__(self, cp):
+        self[cp] = cp if UNICODE_BRAILLE_BASE <= cp < UNICODE_BRAILLE_BASE + NUM_CLASSES else UNICODE_BRAILLE_BASE
+        return self[cp]
+
+
+_BRAILLE_ONLY = _BrailleOnlyTable()
+
 
 def _sanitize_text_lines(lines, max_cols=24):
     """Apply the same normalization used during dataset generation.
@@ -18,27 +141,14 @@ def _sanitize_text_lines(lines, max_cols=24):
     3. Replace any non-Braille character with blank Braille cell
        to avoid missing categories.
     """
-    blank_cell = "\u2800"
-
-    def _norm_line(line):
-        # 1) spaces → blank cell
-        line = line.replace(" ", blank_cell)
-        # 2) ensure only Braille chars
-        line = "".join(
-            ch if UNICODE_BRAILLE_BASE <= ord(ch) < UNICODE_BRAILLE_BASE + NUM_CLASSES else blank_cell
-            for ch in line
-        )
-        return line
-
-    # Wrap and normalise
-    wrapped = []
-    for ln in lines:
-        ln = _norm_line(ln)
-        while len(ln) > max_cols:
-            wrapped.append(ln[:max_cols])
-            ln = ln[max_cols:]
-        wrapped.append(ln)
-    return wrapped
+    return _wrap([ln.translate(_BRAILLE_ONLY) for ln in lines], max_cols)
+
+
+def _wrap(lines, max_cols):
+    """Split lines longer than *max_cols*; already-wrapped input is returned as is."""
+    if max_cols is None or all(len(ln) <= max_cols for ln in lines):
+        return lines
+    return [ln[i:i + max_cols] for ln in lines for i in range(0, max(len(ln), 1), max_cols)]
 
 
 class BraillePage:
@@ -55,16 +165,29 @@ class BraillePage:
             print(f"Warning: Could not load SimBraille.ttf: {e}")
             print("Falling back to default font")
             self.font = ImageFont.load_default()
+        self._cache_glyphs()
+
+    def _cache_glyphs(self):
+        """Rasterise the 64 Braille cells once; pages are then composited
+        from these masks instead of going through FreeType per call."""
+        probe = ImageDraw.Draw(Image.new("L", (1, 1)))
+        self.glyphs = {}
+        self._bbox = {}
+        for cp in range(UNICODE_BRAILLE_BASE, UNICODE_BRAILLE_BASE + NUM_CLASSES):
+            ch = chr(cp)
+            x0, y0, x1, y1 = self._bbox[cp] = probe.textbbox((0, 0), ch, font=self.font)
+            mask = Image.new("L", (max(1, x1 - x0), max(1, y1 - y0)), 0)
+            ImageDraw.Draw(mask).text((-x0, -y0), ch, font=self.font, fill=255)
+            self.glyphs[ch] = (mask, x0, y0, int(self.font.getlength(ch)))
+
+    def _blit(self, img, ch, x, y, fill=(80, 80, 80)):
+        """Paste cached glyph *ch* as if drawn with ``draw.text((x, y), ch)``."""
+        mask, x0, y0, _ = self.glyphs[ch]
+        w, h = mask.size
+        img.paste(fill, (x + x0, y + y0, x + x0 + w, y + y0 + h), mask)
 
     def draw(self, lines, max_cols=None):
-        if max_cols is not None:
-            wrapped = []
-            for ln in lines:
-                while len(ln) > max_cols:
-                    wrapped.append(ln[:max_cols])
-                    ln = ln[max_cols:]
-                wrapped.append(ln)
-            lines = wrapped
+        lines = _wrap(lines, max_cols)
 
         if not lines or all(len(line.strip()) == 0 for line in lines):
             return Image.new("RGB", (self.margin*2 + 200, self.margin*2 + 100), self.paper)
@@ -73,7 +196,7 @@ class BraillePage:
         temp_draw = ImageDraw.Draw(temp_img)
         
         max_width = 0
-        line_height = temp_draw.textbbox((0, 0), "⠿", font=self.font)[3]
+        line_height = self._bbox[ord("⠿")][3]
         
         for line in lines:
             if line.strip():
@@ -91,7 +214,13 @@ class BraillePage:
         y_offset = self.margin
         for line in lines:
             if line.strip():
-                draw.text((self.margin, y_offset), line, font=self.font, fill=(80, 80, 80))
+                if all(ch in self.glyphs for ch in line):
+                    x_offset = self.margin
+                    for ch in line:
+                        self._blit(img, ch, x_offset, y_offset)
+                        x_offset += self.glyphs[ch][3]
+                else:
+                    draw.text((self.margin, y_offset), line, font=self.font, fill=(80, 80, 80))
             y_offset += int(line_height * self.line_spacing)
         
         return img
@@ -101,30 +230,21 @@ class BraillePage:
         
         Args:
             lines: List of braille text lines
-            max_cols: Maximum columns before wrapping
+            max_cols: Maximum columns before wrapping; unneeded for lines
+                already wrapped by _sanitize_text_lines
             char_spacing: Extra spacing between characters in pixels
             
         Returns:
             tuple: (PIL Image, list of (char, x, y, width, height))
         """
-        if max_cols is not None:
-            wrapped = []
-            for ln in lines:
-                while len(ln) > max_cols:
-                    wrapped.append(ln[:max_cols])
-                    ln = ln[max_cols:]
-                wrapped.append(ln)
-            lines = wrapped
+        lines = _wrap(lines, max_cols)
 
         if not lines or all(len(line.strip()) == 0 for line in lines):
             empty_img = Image.new("RGB", (self.margin*2 + 200, self.margin*2 + 100), self.paper)
             return empty_img, []
             
-        temp_img = Image.new("RGB", (1, 1))
-        temp_draw = ImageDraw.Draw(temp_img)
-        
         # Get character dimensions
-        char_bbox = temp_draw.textbbox((0, 0), "⠿", font=self.font)
+        char_bbox = self._bbox[ord("⠿")]
         char_width = char_bbox[2] - char_bbox[0]
         line_height = char_bbox[3] - char_bbox[1]
         
@@ -142,26 +262,22 @@ class BraillePage:
         img = Image.new("RGB", (W, H), self.paper)
         draw = ImageDraw.Draw(img)
         
+        step = char_width + char_spacing
+        char_top_offset = char_bbox[1]  # may be negative if glyph rises above baseline
         character_positions = []
         
         y_offset = self.margin
         for line in lines:
-            x_offset = self.margin
-            for char in line:
-                # Get actual character dimensions for this specific character
-                actual_bbox = temp_draw.textbbox((0, 0), char, font=self.font)
-                actual_width = actual_bbox[2] - actual_bbox[0]
-                actual_height = actual_bbox[3] - actual_bbox[1]
-                
-                # Draw the character
-                draw.text((x_offset, y_offset), char, font=self.font, fill=(80, 80, 80))
-                
-                # Record position including top offset for accurate bbox
-                char_top_offset = char_bbox[1]  # may be negative if glyph rises above baseline
-                character_positions.append((char, x_offset, y_offset + char_top_offset, char_width, line_height))
-                
-                # Move to next character position
-                x_offset += char_width + char_spacing
+            xs = [self.margin + i * step for i in range(len(line))]
+            for char, x_offset in zip(line, xs):
+                if char in self.glyphs:
+                    self._blit(img, char, x_offset, y_offset)
+                else:
+                    draw.text((x_offset, y_offset), char, font=self.font, fill=(80, 80, 80))
+            
+            # Record positions including top offset for accurate bbox
+            y = y_offset + char_top_offset
+            character_positions.extend((char, x, y, char_width, line_height) for char, x in zip(line, xs))
             
             y_offset += int(line_height * increased_line_spacing)
         
@@ -187,10 +303,9 @@ class PhotoAug:
     @staticmethod
     def gradient(img, lo=200, hi=255):
         w,h = img.size
-        g   = Image.linear_gradient("L").resize((w,h))
-        g   = g.rotate(random.uniform(0,360), expand=False)
-        lo  = random.randint(lo, (lo+hi)//2)
-        hi  = random.randint((lo+hi)//2, hi)
+        g   = _gradient_template(w, h).rotate(_random.uniform(0,360), expand=False)
+        lo  = _random.randint(lo, (lo+hi)//2)
+        hi  = _random.randint((lo+hi)//2, hi)
         g   = ImageOps.colorize(g, (lo,lo,lo), (hi,hi,hi))
         return ImageChops.multiply(img, g)
 
@@ -207,17 +322,20 @@ class PhotoAug:
             img = canvas
 
         w, h = img.size
-        j = lambda: random.uniform(-jitter, jitter)
+        j = lambda: _random.uniform(-jitter, jitter)
         src = [(0, 0), (w, 0), (w, h), (0, h)]
         dst = [(x + w * j(), y + h * j()) for (x, y) in src]
 
-        A, B = [], []
-        for (x, y), (u, v) in zip(src, dst):
-            A += [[x, y, 1, 0, 0, 0, -u * x, -u * y],
-                  [0, 0, 0, x, y, 1, -v * x, -v * y]]
-            B += [u, v]
-        A, B = np.asarray(A), np.asarray(B)
-        coeffs = np.linalg.lstsq(A, B, rcond=None)[0]
+        # Four point pairs determine the homography exactly: solve, don't fit
+        s, d = np.array(src, dtype=np.float64), np.array(dst, dtype=np.float64)
+        A = np.zeros((8, 8))
+        A[0::2, 0:2] = s
+        A[0::2, 2] = 1
+        A[1::2, 3:5] = s
+        A[1::2, 5] = 1
+        A[0::2, 6:8] = -d[:, :1] * s
+        A[1::2, 6:8] = -d[:, 1:] * s
+        coeffs = np.linalg.solve(A, d.ravel())
 
         transformed = img.transform((w, h), Image.PERSPECTIVE, coeffs, Image.Resampling.BICUBIC)
 
@@ -234,18 +352,24 @@ class PhotoAug:
     @staticmethod
     def blur(img, sigma=(0.3, 1.0)):
         return img.filter(ImageFilter.GaussianBlur(
-               radius=random.uniform(*sigma)))
+               radius=_random.uniform(*sigma)))
 
     @staticmethod
     def noise(img, sigma=(1,3)):
-        arr = np.asarray(img).astype(np.float32)
-        arr += np.random.normal(0, random.uniform(*sigma), arr.shape)
-        arr  = np.clip(arr, 0, 255).astype(np.uint8)
-        return Image.fromarray(arr)
+        if njit is not None and img.mode == "RGB":
+            seed = int(_rng.integers(0, 2**31))
+            return Image.fromarray(_noise_kernel(np.asarray(img), _random.uniform(*sigma), seed))
+        # int16 is wide enough for pixel + noise and a quarter the size of the old float32 path
+        arr   = np.array(img, dtype=np.int16)
+        noise = _rng.standard_normal(arr.shape, dtype=np.float32)
+        noise *= _random.uniform(*sigma)
+        np.add(arr, noise, out=arr, casting="unsafe")
+        np.clip(arr, 0, 255, out=arr)
+        return Image.fromarray(arr.astype(np.uint8))
 
     @staticmethod
     def white_balance(img, shift=(-8,8)):
-        delta = random.randint(*shift) / 255.0
+        delta = _random.randint(*shift) / 255.0
         r,g,b = img.split()
         r = ImageEnhance.Brightness(r).enhance(1+delta)
         b = ImageEnhance.Brightness(b).enhance(1-delta)
@@ -254,16 +378,16 @@ class PhotoAug:
     @staticmethod
     def vignette(img, strength=(0.15,0.35), invert_prob=0.25):
         w, h = img.size
-        y, x = np.ogrid[-1:1:h*1j, -1:1:w*1j]
-        d = np.sqrt(x*x + y*y)
-        d = d / d.max()
+        d2, d2_inv = _vignette_falloff(w, h)
 
-        invert = random.random() < invert_prob
+        invert = _random.random() < invert_prob
         if invert:
-            d = 1 - d
+            d2 = d2_inv
 
-        f = random.uniform(*strength)
-        alpha = np.clip((d**2) * f, 0, 1)
+        f = _random.uniform(*strength)
+        if njit is not None and img.mode == "RGB":
+            return Image.fromarray(_vignette_kernel(np.asarray(img), d2, f, 0.5 if invert else 1.0))
+        alpha = np.clip(d2 * f, 0, 1)
 
         if invert:
             alpha *= 0.5
@@ -275,46 +399,55 @@ class PhotoAug:
     @staticmethod
     def shadow(img, radius_frac=(0.15,0.4), darkness=(0.5,0.8)):
         w, h = img.size
-        r = random.uniform(*radius_frac) * min(w, h)
-        x0 = random.uniform(0, w)
-        y0 = random.uniform(0, h)
+        r = _random.uniform(*radius_frac) * min(w, h)
+        x0 = _random.uniform(0, w)
+        y0 = _random.uniform(0, h)
 
         mask = Image.new('L', (w, h), 0)
         draw = ImageDraw.Draw(mask)
         draw.ellipse((x0 - r, y0 - r, x0 + r, y0 + r), fill=255)
         mask = mask.filter(ImageFilter.GaussianBlur(radius=r * 0.3))
 
-        dark_factor = random.uniform(*darkness)
+        dark_factor = _random.uniform(*darkness)
         darker = ImageEnhance.Brightness(img).enhance(dark_factor)
         return Image.composite(darker, img, mask)
 
     @staticmethod
     def chrome_aberr(img, shift_px=(-1, 1)):
         r, g, b = img.split()
-        dx_r = random.randint(*shift_px)
-        dy_r = random.randint(*shift_px)
-        dx_b = random.randint(*shift_px)
-        dy_b = random.randint(*shift_px)
+        dx_r = _random.randint(*shift_px)
+        dy_r = _random.randint(*shift_px)
+        dx_b = _random.randint(*shift_px)
+        dy_b = _random.randint(*shift_px)
         r = ImageChops.offset(r, dx_r, dy_r)
         b = ImageChops.offset(b, dx_b, dy_b)
         return Image.merge('RGB', (r, g, b))
 
     @staticmethod
     def jpeg(img, q=(75,95)):
+        quality = _random.randint(*q)
+        if _TJ is not None and img.mode == "RGB":
+            data = _TJ.encode(np.asarray(img), quality=quality, pixel_format=TJPF_RGB,
+                              jpeg_subsample=TJSAMP_420)
+            return Image.fromarray(_TJ.decode(data, pixel_format=TJPF_RGB))
         buf = BytesIO()
-        img.save(buf,"JPEG",quality=random.randint(*q))
-        return Image.open(buf)
+        img.save(buf,"JPEG",quality=quality)
+        img = Image.open(buf)
+        img.load()  # decode now rather than lazily in whichever step touches it next
+        return img
 
     @staticmethod
     def rotate(img, degrees=(-2,2)):
-        angle = random.uniform(*degrees)
+        angle = _random.uniform(*degrees)
         return img.rotate(angle, resample=Image.Resampling.BICUBIC,
                           expand=True, fillcolor=img.getpixel((0,0)))
 
     @staticmethod
     def focus_drop(img, sigma=(0.2,1.5)):
         w,h = img.size
-        blur = img.filter(ImageFilter.GaussianBlur(radius=random.uniform(*sigma)))
+        blur = img.filter(ImageFilter.GaussianBlur(radius=_random.uniform(*sigma)))
+        if njit is not None and img.mode == "RGB":
+            return Image.fromarray(_focus_drop_kernel(np.asarray(img), np.asarray(blur)))
         grad = np.tile(np.linspace(255,0,h, dtype=np.uint8)[:,None], (1,w))
         mask = Image.fromarray(grad, 'L')
         return Image.composite(blur, img, mask)
@@ -322,13 +455,13 @@ class PhotoAug:
     @staticmethod
     def background(img, pad_frac=(0.01,0.03)):
         w,h = img.size
-        pad = int(random.uniform(*pad_frac) * max(w,h))
+        pad = int(_random.uniform(*pad_frac) * max(w,h))
         W,H = w+pad*2, h+pad*2
-        base_col = random.randint(200,240)
-        col = (base_col+random.randint(-5,5),)*3
+        base_col = _random.randint(200,240)
+        col = (base_col+_random.randint(-5,5),)*3
         canvas = Image.new('RGB', (W,H), col)
-        off_x = random.randint(0, pad)
-        off_y = random.randint(0, pad)
+        off_x = _random.randint(0, pad)
+        off_y = _random.randint(0, pad)
         canvas.paste(img, (off_x, off_y))
         return canvas
 
@@ -336,30 +469,35 @@ class PhotoAug:
     def dirt(img, density=0.001, darkness=(0.5,0.8)):
         w,h = img.size
         num = int(w*h*density)
-        overlay = img.copy()
-        draw = ImageDraw.Draw(overlay)
-        for _ in range(num):
-            x = random.randint(0,w-1)
-            y = random.randint(0,h-1)
-            r = random.randint(1,2)
-            shade = int(255*random.uniform(*darkness))
-            draw.ellipse((x-r,y-r,x+r,y+r), fill=(shade,shade,shade))
+        overlay = np.array(img)
+        xs = _rng.integers(0, w, num)
+        ys = _rng.integers(0, h, num)
+        rs = _rng.integers(1, 3, num)
+        shades = (255*_rng.uniform(*darkness, num)).astype(np.uint8)
+        # Stamp every speck of a given radius at once with a disc of offsets
+        for r in (1, 2):
+            sel = rs == r
+            dy, dx = np.nonzero(np.add.outer(np.arange(-r, r+1)**2, np.arange(-r, r+1)**2) <= r*r)
+            yy = np.clip(ys[sel, None] + (dy - r), 0, h-1)
+            xx = np.clip(xs[sel, None] + (dx - r), 0, w-1)
+            overlay[yy, xx] = shades[sel, None, None]
+        overlay = Image.fromarray(overlay)
         alpha = 20
         return Image.blend(img, overlay, alpha/255.0)
 
     def __call__(self, img):
-        if random.random()<self.cfg["gradient"]:      img=self.gradient(img)
-        if random.random()<self.cfg["perspective"]:   img=self.perspective(img)
-        if random.random()<self.cfg["blur"]:          img=self.blur(img)
-        if random.random()<self.cfg["noise"]:         img=self.noise(img)
-        if random.random()<self.cfg["white_balance"]: img=self.white_balance(img)
-        if random.random()<self.cfg["vignette"]:      img=self.vignette(img)
-        if random.random()<self.cfg["focus_drop"]:    img=self.focus_drop(img)
-        if random.random()<self.cfg["shadow"]:        img=self.shadow(img)
-        if random.random()<self.cfg["chrome_aberr"]:   img=self.chrome_aberr(img)
-        if random.random()<self.cfg["background"]:    img=self.background(img)
-        if random.random()<self.cfg["dirt"]:          img=self.dirt(img)
-        if random.random()<self.cfg["jpeg"]:          img=self.jpeg(img)
+        if _random.random()<self.cfg["gradient"]:      img=self.gradient(img)
+        if _random.random()<self.cfg["perspective"]:   img=self.perspective(img)
+        if _random.random()<self.cfg["blur"]:          img=self.blur(img)
+        if _random.random()<self.cfg["noise"]:         img=self.noise(img)
+        if _random.random()<self.cfg["white_balance"]: img=self.white_balance(img)
+        if _random.random()<self.cfg["vignette"]:      img=self.vignette(img)
+        if _random.random()<self.cfg["focus_drop"]:    img=self.focus_drop(img)
+        if _random.random()<self.cfg["shadow"]:        img=self.shadow(img)
+        if _random.random()<self.cfg["chrome_aberr"]:   img=self.chrome_aberr(img)
+        if _random.random()<self.cfg["background"]:    img=self.background(img)
+        if _random.random()<self.cfg["dirt"]:          img=self.dirt(img)
+        if _random.random()<self.cfg["jpeg"]:          img=self.jpeg(img)
         return img
 
 if __name__ == "__main__":
@@ -368,7 +506,7 @@ if __name__ == "__main__":
     lines = [louis.translateString(["ur-pk-g1.utb"], urdu)]
     # Normalise text the same way as dataset generation
     lines_norm = _sanitize_text_lines(lines, max_cols=24)
-    page, _ = BraillePage().draw_with_positions(lines_norm, max_cols=24, char_spacing=int(48*0.4))
+    page, _ = BraillePage().draw_with_positions(lines_norm, char_spacing=int(48*0.4))
     aug    = PhotoAug()
 
     page.save("braille_clean.png")
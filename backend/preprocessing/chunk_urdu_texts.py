@@ -1,6 +1,7 @@
 # chunk_urdu_texts.py
 # Clean and chunk Urdu texts into sentence-based segments for Braille training.
 
+import json
 import pathlib
 import re
 import unicodedata
@@ -8,13 +9,36 @@ from typing import List, Optional
 from tqdm import tqdm
 
 SRC_DIR = pathlib.Path("../../data/plain")
-DST_DIR = pathlib.Path("../../data/chunks")
-DST_DIR.mkdir(parents=True, exist_ok=True)
+# One JSON record per line: {"id": int, "text": str}
+DST_FILE = pathlib.Path("../../data/chunks.jsonl")
+DST_FILE.parent.mkdir(parents=True, exist_ok=True)
 
 MIN_CHARS = 30
 MAX_CHARS = 80
 TARGET_CHUNKS = None  # No limit on chunks
 
+# Punctuation swap and quote/bracket removal in one translate pass
+_CLEAN_TABLE = str.maketrans('.,;?', '۔،؛؟', '"()[]{}')
+# Remaining clean_urdu_text steps fused into one scan. A dash run also spans
+# backslash runs, which the sequential version removed before collapsing
+# dashes; lone backslashes go with the other symbols afterwards.
+_CLEAN_RE = re.compile(r'(?P<dash>[-—–](?:(?:\\{2,})?[-—–])+)|\\{2,}|[#@%&*+=<>|\\/]')
+
+_QUOTES_BRACKETS_RE = re.compile(r'[\"\"\"''()[\\]{}]')
+_ELLIPSIS_RE = re.compile(r'[\\.]{2,}')
+_DASHES_RE = re.compile(r'[-—–]{2,}')
+_SYMBOLS_RE = re.compile(r'[#@%&*+=<>|\\\\\\/]')
+_WHITESPACE_RE = re.compile(r'\\s+')
+
+_DIACRITICS_RE = re.compile(r'[\\u064B-\\u065F\\u0670\\u06D6-\\u06ED]')
+_INVISIBLES_RE = re.compile(r'[\\u200B\\u200C\\u200D\\u200E\\u200F\\u061C]')
+_NBSP_RE = re.compile(r'[\\u00A0]')
+_TATWEEL_RE = re.compile(r'ـ')
+_LATIN_RE = re.compile(r'[a-zA-Z]')
+_PERCENT_RE = re.compile(r'[%٪]')
+_NEWLINES_RE = re.compile(r'\\r\\n|\\r|\\n')
+_SENTENCE_END_RE = re.compile(r'[۔؟؍]')
+
 def clean_urdu_text(text: str) -> Optional[str]:
     if not text or len(text.strip()) < 500:
         return None
@@ -26,40 +50,32 @@ def clean_urdu_text(text: str) -> Optional[str]:
     except UnicodeError:
         return None
     
-    text = text.replace('.', '۔')
-    text = text.replace(',', '،')
-    text = text.replace(';', '؛')
-    text = text.replace('?', '؟')
-    
-    text = re.sub(r'[\"\"\"''()[\\]{}]', '', text)
-    text = re.sub(r'[\\.]{2,}', '', text)
-    text = re.sub(r'[-—–]{2,}', ' ', text)
-    text = re.sub(r'[#@%&*+=<>|\\\\\\/]', '', text)
-    text = re.sub(r'\\s+', ' ', text).strip()
+    text = text.translate(_CLEAN_TABLE)
+    text = _CLEAN_RE.sub(lambda m: ' ' if m.lastgroup == 'dash' else '', text).strip()
     
     return text
 
 def sanitize_for_braille(text: str) -> str:
-    text = re.sub(r'[\\u064B-\\u065F\\u0670\\u06D6-\\u06ED]', '', text)
-    text = re.sub(r'[\\u200B\\u200C\\u200D\\u200E\\u200F\\u061C]', '', text)
-    text = re.sub(r'[\\u00A0]', ' ', text)
-    text = re.sub(r'ـ', '', text)
-    text = re.sub(r'[a-zA-Z]', '', text)
-    text = re.sub(r'[%٪]', 'فی صد', text)
-    text = re.sub(r'\\r\\n|\\r|\\n', '\\n', text)
-    text = re.sub(r'\\s+', ' ', text).strip()
+    text = _DIACRITICS_RE.sub('', text)
+    text = _INVISIBLES_RE.sub('', text)
+    text = _NBSP_RE.sub(' ', text)
+    text = _TATWEEL_RE.sub('', text)
+    text = _LATIN_RE.sub('', text)
+    text = _PERCENT_RE.sub('فی صد', text)
+    text = _NEWLINES_RE.sub('\\n', text)
+    text = _WHITESPACE_RE.sub(' ', text).strip()
     return text
 
 def clean_sentence_punctuation(sentence: str) -> str:
-    sentence = re.sub(r'[\"\"\"''()[\\]{}]', '', sentence)
-    sentence = re.sub(r'[\\.]{2,}', '', sentence)
-    sentence = re.sub(r'[-—–]{2,}', ' ', sentence)
-    sentence = re.sub(r'[#@%&*+=<>|\\\\\\/]', '', sentence)
-    sentence = re.sub(r'\\s+', ' ', sentence).strip()
+    sentence = _QUOTES_BRACKETS_RE.sub('', sentence)
+    sentence = _ELLIPSIS_RE.sub('', sentence)
+    sentence = _DASHES_RE.sub(' ', sentence)
+    sentence = _SYMBOLS_RE.sub('', sentence)
+    sentence = _WHITESPACE_RE.sub(' ', sentence).strip()
     return sentence
 
 def split_into_sentences(text: str) -> List[str]:
-    sentences = re.split(r'[۔؟؍]', text)
+    sentences = _SENTENCE_END_RE.split(text)
     return [s.strip() for s in sentences if s.strip()]
 
 def chunk_sentences(sentences: List[str]) -> List[str]:
@@ -134,10 +150,9 @@ def main():
         import random
         all_chunks = random.sample(all_chunks, TARGET_CHUNKS)
     
-    for i, chunk in enumerate(tqdm(all_chunks, desc="Saving chunks", unit="chunk")):
-        chunk_file = DST_DIR / f"chunk_{i:05d}.txt"
-        with open(chunk_file, 'w', encoding='utf-8') as f:
-            f.write(chunk + "\\n")
+    with open(DST_FILE, 'w', encoding='utf-8') as f:
+        for i, chunk in enumerate(tqdm(all_chunks, desc="Saving chunks", unit="chunk")):
+            f.write(json.dumps({"id": i, "text": chunk}, ensure_ascii=False) + "\n")
     
     stats_content = f"""Urdu Text Chunking Statistics
 
@@ -155,7 +170,7 @@ Sample chunks:
     
     print(f"\\n✅ Chunking complete!")
     print(f"Generated {len(all_chunks)} chunks from {processed_files} files")
-    print(f"Saved to: {DST_DIR}")
+    print(f"Saved to: {DST_FILE}")
     print(f"Statistics saved to: ../data/chunk_stats.txt")
 
 if __name__ == "__main__":
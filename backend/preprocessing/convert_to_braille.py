@@ -1,22 +1,57 @@
 # convert_to_braille.py
 # Convert cleaned Urdu text chunks to Grade-1 Braille using liblouis.
 
+import json
 import pathlib
-from typing import Optional
+import numpy as np
+from typing import List, Optional
 from tqdm import tqdm
 
 import louis
 from utils.text_clean import clean_source
 
-SRC_DIR = pathlib.Path("../../data/chunks")
-DST_DIR = pathlib.Path("../../data/braille")
-DST_DIR.mkdir(parents=True, exist_ok=True)
+# JSONL in and out: {"id", "text"} from chunk_urdu_texts.py -> {"id", "braille"}
+SRC_FILE = pathlib.Path("../../data/chunks.jsonl")
+DST_FILE = pathlib.Path("../../data/braille.jsonl")
+
+_TABLES = ['ur-pk-g1.utb']
+BATCH_SIZE = 256
+
+# liblouis caches compiled tables; load ours once up front
+louis.translateString(_TABLES, ' ')
 
 def to_braille(text):
-    return louis.translateString(['ur-pk-g1.utb'] , text)
+    return louis.translateString(_TABLES , text)
 
 def to_text(braille):
-    return louis.backTranslateString(['ur-pk-g1.utb'] , braille)
+    return louis.backTranslateString(_TABLES , braille)
+
+def to_braille_batch(texts: List[str]) -> List[str]:
+    """Translate single-line *texts* with one liblouis call, joined on newlines.
+
+    Falls back to per-text calls if the output doesn't split back into the
+    same number of pieces.
+    """
+    if not texts:
+        return []
+    out = to_braille("\n".join(texts)).split("\n")
+    if len(out) != len(texts):
+        return [to_braille(t) for t in texts]
+    return out
+
+def _validate_braille(braille: str) -> Optional[str]:
+    """Return stripped *braille* if it holds only 6-dot cells and spaces, else None."""
+    if not braille or len(braille.strip()) == 0:
+        return None
+
+    # 3️⃣  Validation: keep only 6-dot patterns (0–63) + spaces
+    codes = np.frombuffer(braille.encode('utf-32-le'), dtype=np.uint32)
+    # Unsigned wrap-around sends code points below U+2800 out of range too
+    if not ((codes == 0x20) | (codes - 0x2800 < 64)).all():
+        # Skip this piece of text; caller treats None as conversion failure
+        return None
+
+    return braille.strip()
 
 def convert_text_to_braille(text: str) -> Optional[str]:
     """Clean *text*, convert to Grade-1 Braille, ensure only 6-dot cells.
@@ -31,89 +66,91 @@ def convert_text_to_braille(text: str) -> Optional[str]:
             return None
 
         # 2️⃣  Urdu → Braille
-        braille = to_braille(text)
-        if not braille or len(braille.strip()) == 0:
-            return None
-
-        # 3️⃣  Validation: keep only 6-dot patterns (0–63) + spaces
-        for ch in braille:
-            if ch == ' ':
-                continue  # ASCII spaces are fine
-            val = ord(ch) - 0x2800
-            if val < 0 or val >= 64:
-                # Skip this piece of text; caller treats None as conversion failure
-                return None
-
-        return braille.strip()
+        return _validate_braille(to_braille(text))
 
     except Exception as e:
         print(f"Error converting text to Braille: {e}")
         print(f"Text was: {text[:100]}…")
         return None
 
+def convert_batch_to_braille(texts: List[str]) -> List[Optional[str]]:
+    """Batched :func:`convert_text_to_braille`; one result per input text."""
+    cleaned = []
+    for text in texts:
+        try:
+            cleaned.append(clean_source(text.strip()))
+        except Exception as e:
+            print(f"Error converting text to Braille: {e}")
+            cleaned.append("")
 
-            
+    # Only single-line texts can share a newline-joined liblouis call
+    batch_idx = [i for i, t in enumerate(cleaned) if t and "\n" not in t]
+    results: List[Optional[str]] = [None] * len(texts)
+    try:
+        for i, braille in zip(batch_idx, to_braille_batch([cleaned[i] for i in batch_idx])):
+            results[i] = _validate_braille(braille)
+    except Exception as e:
+        print(f"Error converting batch to Braille, retrying one by one: {e}")
+        for i in batch_idx:
+            results[i] = convert_text_to_braille(texts[i])
 
+    for i, t in enumerate(cleaned):
+        if "\n" in t:
+            results[i] = convert_text_to_braille(texts[i])
+    return results
 
 
 def main():
-    chunk_files = sorted(SRC_DIR.glob("chunk_*.txt"))
+    if not SRC_FILE.exists():
+        print(f"No chunk file found at {SRC_FILE}")
+        return
+
+    with open(SRC_FILE, 'r', encoding='utf-8') as f:
+        chunks = [json.loads(line) for line in f if line.strip()]
     
-    if not chunk_files:
-        print(f"No chunk files found in {SRC_DIR}")
+    if not chunks:
+        print(f"No chunks found in {SRC_FILE}")
         return
         
-    print(f"Converting {len(chunk_files)} text chunks to Grade-1 Braille...")
+    print(f"Converting {len(chunks)} text chunks to Grade-1 Braille...")
     
     converted_count = 0
     failed_count = 0
+    samples = []
     
-    for chunk_file in tqdm(chunk_files, desc="Converting to Braille", unit="file"):
-        try:
-            with open(chunk_file, 'r', encoding='utf-8') as f:
-                urdu_text = f.read().strip()
-                
-            if not urdu_text:
-                print(f"Skipping empty file: {chunk_file.name}")
-                failed_count += 1
-                continue
-                
-            braille_text = convert_text_to_braille(urdu_text)
-            
-            if braille_text is None:
-                failed_count += 1
-                continue
+    with open(DST_FILE, 'w', encoding='utf-8') as out, \
+            tqdm(total=len(chunks), desc="Converting to Braille", unit="chunk") as pbar:
+        for start in range(0, len(chunks), BATCH_SIZE):
+            batch = []
+            for chunk in chunks[start:start + BATCH_SIZE]:
+                if not chunk["text"].strip():
+                    print(f"Skipping empty chunk: {chunk['id']}")
+                    failed_count += 1
+                    continue
+                batch.append(chunk)
                 
-            braille_file = DST_DIR / chunk_file.name
-            with open(braille_file, 'w', encoding='utf-8') as f:
-                f.write(braille_text + '\n')
-                
-            converted_count += 1
-                
-        except Exception as e:
-            print(f"Error processing {chunk_file.name}: {e}")
-            failed_count += 1
-            continue
+            results = convert_batch_to_braille([chunk["text"] for chunk in batch])
+            for chunk, braille_text in zip(batch, results):
+                if braille_text is None:
+                    failed_count += 1
+                    continue
+                    
+                out.write(json.dumps({"id": chunk["id"], "braille": braille_text}, ensure_ascii=False) + "\n")
+                converted_count += 1
+                if len(samples) < 3:
+                    samples.append((chunk, braille_text))
+            pbar.update(min(BATCH_SIZE, len(chunks) - start))
     
     print(f"\nConversion complete!")
-    print(f"Successfully converted: {converted_count} files")
-    print(f"Failed conversions: {failed_count} files")
-    print(f"Output directory: {DST_DIR}")
+    print(f"Successfully converted: {converted_count} chunks")
+    print(f"Failed conversions: {failed_count} chunks")
+    print(f"Output file: {DST_FILE}")
     
-    if converted_count > 0:
+    if samples:
         print(f"\nSample conversions:")
-        sample_files = sorted(DST_DIR.glob("chunk_*.txt"))[:3]
-        
-        for sample_file in sample_files:
-            orig_file = SRC_DIR / sample_file.name
-            with open(orig_file, 'r', encoding='utf-8') as f:
-                orig_text = f.read().strip()
-                
-            with open(sample_file, 'r', encoding='utf-8') as f:
-                braille_text = f.read().strip()
-                
-            print(f"\n{sample_file.name}:")
-            print(f"Original: {orig_text}")
+        for chunk, braille_text in samples:
+            print(f"\nchunk {chunk['id']}:")
+            print(f"Original: {chunk['text'].strip()}")
             print(f"Braille:  {braille_text}")
 
 if __name__ == "__main__":
@@ -2,82 +2,97 @@
 # Extract <body> text from XML files in data/text/ and write plain text files to data/plain/.
 
 import argparse
+import concurrent.futures
 import pathlib
 import re
 import sys
-import xml.etree.ElementTree as ET
 from typing import Iterable
 
+try:
+    # libxml2-backed parser; copes with very large files. No recover=True:
+    # malformed files are skipped, as with the stdlib parser
+    from lxml import etree as ET
+    _ITERPARSE_KWARGS = {"huge_tree": True,
+                         "remove_comments": True, "remove_pis": True}
+except ImportError:
+    import xml.etree.ElementTree as ET
+    _ITERPARSE_KWARGS = {}
+
 SRC_DIR = pathlib.Path("../../data/text")
 DST_DIR = pathlib.Path("../../data/plain")
 DST_DIR.mkdir(parents=True, exist_ok=True)
 
 WHITESPACE_RE = re.compile(r"\s+")
 
-def extract_body_text(xml_path: pathlib.Path) -> str | None:
-    try:
-        tree = ET.parse(xml_path)
-        root = tree.getroot()
-        
-        body_elements = [elem for elem in root.iter() if elem.tag.endswith('body')]
-        
-        if not body_elements:
-            return None
-            
-        body = body_elements[0]
-        text_content = " ".join(body.itertext()).strip()
-        
-        if not text_content:
-            return None
-            
-        text_content = WHITESPACE_RE.sub(" ", text_content)
-        return text_content
-        
-    except (ET.ParseError, FileNotFoundError, PermissionError):
-        return None
+def _urdu_flag_ok(element) -> bool:
+    return bool(element.text and element.text.strip().lower() == 'no')
+
+def parse_once(xml_path: pathlib.Path, urdu_only: bool = False) -> tuple[bool, str | None]:
+    """Stream *xml_path* once and return ``(urdu_ok, body_text)``.
 
-def check_urdu_only(xml_path: pathlib.Path) -> bool:
+    ``urdu_ok`` is False only when the first <contains-non-urdu-languages>
+    element says something other than 'No'; ``body_text`` is the whitespace-
+    collapsed text of the first <body>, or None. Elements outside the body
+    are cleared as soon as they close, so memory stays bounded.
+    """
+    urdu_ok = True
+    flag = body = None
+    body_text = None
     try:
-        tree = ET.parse(xml_path)
-        root = tree.getroot()
-        
-        non_urdu_elements = [elem for elem in root.iter() 
-                           if elem.tag.endswith('contains-non-urdu-languages')]
-        
-        if not non_urdu_elements:
-            return True
-            
-        element = non_urdu_elements[0]
-        return element.text and element.text.strip().lower() == 'no'
-        
-    except (ET.ParseError, FileNotFoundError, PermissionError):
-        return True
+        for event, elem in ET.iterparse(str(xml_path), events=('start', 'end'),
+                                        **_ITERPARSE_KWARGS):
+            if event == 'start':
+                if flag is None and elem.tag.endswith('contains-non-urdu-languages'):
+                    flag = elem
+                elif body is None and elem.tag.endswith('body'):
+                    body = elem
+                continue
+            if elem is flag:
+                urdu_ok = _urdu_flag_ok(elem)
+                if urdu_only and not urdu_ok:
+                    return False, None
+            if elem is body:
+                body_text = " ".join(body.itertext()).strip()
+            elif body is not None and body_text is None:
+                continue  # still inside <body>; its children are needed for itertext
+            elem.clear()
+    except (ET.ParseError, OSError):  # lxml reports unreadable files as plain OSError
+        return True, None
+
+    if not body_text:
+        return urdu_ok, None
+    return urdu_ok, WHITESPACE_RE.sub(" ", body_text)
+
+def _process_one(task: tuple[pathlib.Path, bool]) -> tuple[str, str | None]:
+    """Worker: return ``(output_filename, body_text)``; text is None if the file is skipped."""
+    xml_file, urdu_only = task
+    urdu_ok, body_text = parse_once(xml_file, urdu_only)
+    if urdu_only and not urdu_ok:
+        body_text = None
+    return f"{xml_file.stem}.txt", body_text
 
 def process_xml_files(xml_files: Iterable[pathlib.Path], urdu_only: bool = False) -> tuple[int, int]:
     extracted_count = 0
     skipped_count = 0
     
-    for xml_file in xml_files:
-        if urdu_only and not check_urdu_only(xml_file):
-            skipped_count += 1
-            continue
-            
-        body_text = extract_body_text(xml_file)
-        
-        if body_text is None:
-            skipped_count += 1
-            continue
-            
-        output_file = DST_DIR / f"{xml_file.stem}.txt"
-        
-        try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(body_text)
-            extracted_count += 1
+    # Files are independent: parse in worker processes, write from here only
+    tasks = [(xml_file, urdu_only) for xml_file in xml_files]
+    with concurrent.futures.ProcessPoolExecutor() as ex:
+        for name, body_text in ex.map(_process_one, tasks, chunksize=16):
+            if body_text is None:
+                skipped_count += 1
+                continue
+                
+            output_file = DST_DIR / name
             
-        except (OSError, IOError) as e:
-            print(f"Error writing {output_file}: {e}", file=sys.stderr)
-            skipped_count += 1
+            try:
+                with open(output_file, 'w', encoding='utf-8') as f:
+                    f.write(body_text)
+                extracted_count += 1
+                
+            except (OSError, IOError) as e:
+                print(f"Error writing {output_file}: {e}", file=sys.stderr)
+                skipped_count += 1
     
     return extracted_count, skipped_count
 
@@ -1,11 +1,10 @@
 import os
-import json
-import base64
 import argparse
+import asyncio
 from pathlib import Path
 from typing import List, Optional
 from pydantic import BaseModel
-from ollama import chat
+from ollama import AsyncClient
 from tqdm import tqdm
 
 class KeyElement(BaseModel):
@@ -22,52 +21,97 @@ class DiagramAnalysis(BaseModel):
     flow_details: str
     overall_summary: str
 
-def encode_image_to_base64(image_path: str) -> str:
-    """Encode image to base64 string for Ollama API."""
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode('utf-8')
+# Structured-output schema sent with every request; built once
+_ANALYSIS_SCHEMA = DiagramAnalysis.model_json_schema()
 
 def read_prompt_from_file(prompt_file: str) -> str:
     """Read the prompt from the diagram2json.txt file."""
     with open(prompt_file, 'r', encoding='utf-8') as f:
         return f.read().strip()
 
-def process_image_with_ollama(image_path: str, prompt: str) -> Optional[DiagramAnalysis]:
+# Requests kept in flight. Match the server's OLLAMA_NUM_PARALLEL so they are
+# decoded together rather than queued; OLLAMA_MAX_LOADED_MODELS=1 stops the
+# server from loading extra copies of the model to serve them.
+DEFAULT_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+
+MODEL = 'gemma3:27b'
+# Keep the model resident between requests and across re-runs; the server's
+# default 5 minute idle unload means a multi-GB reload on every cold start
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "24h")
+
+async def process_image_with_ollama(client: AsyncClient, sem: asyncio.Semaphore,
+                                    image_path: str, prompt: str) -> Optional[DiagramAnalysis]:
     """Process a single image with Ollama and return structured analysis."""
-    try:
-        # Encode image to base64
-        image_base64 = encode_image_to_base64(image_path)
-        
-        # Prepare the message with image and prompt
-        messages = [
-            {
-                'role': 'user',
-                'content': prompt,
-                'images': [image_base64]
-            }
-        ]
-        
-        # Send request to Ollama with structured output format
-        response = chat(
-            messages=messages,
-            model='gemma3:27b',
-            format=DiagramAnalysis.model_json_schema(),
-        )
-        
-        # Parse and validate the response
-        analysis = DiagramAnalysis.model_validate_json(response.message.content)
-        return analysis
-        
-    except Exception as e:
-        print(f"Error processing {image_path}: {str(e)}")
-        return None
+    async with sem:
+        try:
+            # Prepare the message with image and prompt; the client reads and
+            # encodes the file itself when handed a Path
+            messages = [
+                {
+                    'role': 'user',
+                    'content': prompt,
+                    'images': [Path(image_path)]
+                }
+            ]
+            
+            # Send request to Ollama with structured output format
+            response = await client.chat(
+                messages=messages,
+                model=MODEL,
+                format=_ANALYSIS_SCHEMA,
+                keep_alive=KEEP_ALIVE,
+            )
+            
+            # Parse and validate the response
+            analysis = DiagramAnalysis.model_validate_json(response.message.content)
+            return analysis
+            
+        except Exception as e:
+            print(f"Error processing {image_path}: {str(e)}")
+            return None
 
 def save_analysis(analysis: DiagramAnalysis, output_path: str, image_name: str, pbar=None):
     """Save the analysis to a JSON file."""
     output_file = os.path.join(output_path, f"{image_name}.json")
     
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(analysis.model_dump(), f, indent=2, ensure_ascii=False)
+    # Compact JSON straight from pydantic-core's encoder, handed to the OS in one write
+    with open(output_file, 'wb', buffering=65536) as f:
+        f.write(analysis.model_dump_json().encode('utf-8'))
+
+async def process_images(image_files: List[Path], prompt: str, output_dir: Path,
+                         parallel: int, total: int) -> tuple[int, int]:
+    """Analyse *image_files* with up to *parallel* requests in flight, saving each as it finishes."""
+    client = AsyncClient()
+    sem = asyncio.Semaphore(max(1, parallel))
+    processed_count = 0
+    failed_count = 0
+
+    async def _one(image_file: Path):
+        return image_file, await process_image_with_ollama(client, sem, str(image_file), prompt)
+
+    # An empty prompt just loads the model, so the first batch isn't stuck behind the load
+    try:
+        await client.generate(model=MODEL, prompt='', keep_alive=KEEP_ALIVE)
+    except Exception as e:
+        print(f"Could not preload {MODEL}: {e}")
+
+    # Create progress bar
+    pbar = tqdm(total=total, initial=total - len(image_files), desc="Processing images", unit="image")
+    
+    for next_done in asyncio.as_completed([_one(f) for f in image_files]):
+        image_file, analysis = await next_done
+        
+        if analysis:
+            save_analysis(analysis, str(output_dir), image_file.stem, pbar)
+            processed_count += 1
+        else:
+            failed_count += 1
+            pbar.write(f"Failed to process {image_file.name}")
+        pbar.set_postfix({"current": image_file.name, "processed": processed_count, "failed": failed_count})
+        pbar.update()
+    
+    pbar.close()
+    return processed_count, failed_count
 
 def main():
     parser = argparse.ArgumentParser(description='Generate structured dataset from science diagrams')
@@ -79,6 +123,8 @@ def main():
                        help='Directory to save JSON analyses')
     parser.add_argument('--prompt-file', type=str, default='diagram2json.txt',
                        help='File containing the analysis prompt')
+    parser.add_argument('--parallel', type=int, default=DEFAULT_PARALLEL,
+                       help='Concurrent Ollama requests (default: $OLLAMA_NUM_PARALLEL or 4)')
     
     args = parser.parse_args()
     
@@ -106,8 +152,11 @@ def main():
     
     # Get list of image files
     image_extensions = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff'}
-    image_files = [f for f in images_dir.iterdir() 
-                   if f.is_file() and f.suffix.lower() in image_extensions]
+    # scandir gives the file type from the directory entry; the name test runs first
+    # so only candidate images are turned into Paths
+    with os.scandir(images_dir) as it:
+        image_files = [Path(e.path) for e in it
+                       if os.path.splitext(e.name)[1].lower() in image_extensions and e.is_file()]
     
     # Limit number of images if specified
     if args.count is not None:
@@ -116,32 +165,13 @@ def main():
     else:
         print(f"Processing all {len(image_files)} images")
     
-    # Process each image
-    processed_count = 0
-    failed_count = 0
-    
-    # Create progress bar
-    pbar = tqdm(image_files, desc="Processing images", unit="image")
-    
-    for image_file in pbar:
-        pbar.set_postfix({"current": image_file.name})
-        
-        # Check if output already exists
-        output_file = output_dir / f"{image_file.stem}.json"
-        if output_file.exists():
-            continue
-        
-        # Process the image
-        analysis = process_image_with_ollama(str(image_file), prompt)
-        
-        if analysis:
-            save_analysis(analysis, str(output_dir), image_file.stem, pbar)
-            processed_count += 1
-            pbar.set_postfix({"current": image_file.name, "processed": processed_count, "failed": failed_count})
-        else:
-            failed_count += 1
-            pbar.write(f"Failed to process {image_file.name}")
-            pbar.set_postfix({"current": image_file.name, "processed": processed_count, "failed": failed_count})
+    # Skip images whose output already exists (one directory scan, not a stat per image);
+    # empty files left by an interrupted run are redone
+    with os.scandir(output_dir) as it:
+        done = {e.name[:-5] for e in it if e.name.endswith('.json') and e.stat().st_size > 0}
+    pending = [f for f in image_files if f.stem not in done]
+    processed_count, failed_count = asyncio.run(
+        process_images(pending, prompt, output_dir, args.parallel, len(image_files)))
     
     print(f"\n=== Processing Complete ===")
     print(f"Successfully processed: {processed_count} images")
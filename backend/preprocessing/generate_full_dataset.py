@@ -1,20 +1,27 @@
+import functools
+import json
 import pathlib
 import os
 import random
+import sys
+import multiprocessing as mp
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import yaml
-from typing import List
+from typing import List, Optional, Tuple
 
+from PIL import ImageDraw, ImageFont
 from tqdm import tqdm
 
-from preprocessing.braille_synthetic_photo import BraillePage, PhotoAug, _sanitize_text_lines
+from preprocessing.braille_synthetic_photo import BraillePage, PhotoAug, _sanitize_text_lines, save_jpeg, seed_augmentations
 
 # ---------------------------------------------------------------------------
 # Paths & constants
 # ---------------------------------------------------------------------------
 
 # Source data (unchanged)
-CHUNKS_DIR = pathlib.Path("../../data/chunks")
-BRAILLE_DIR = pathlib.Path("../../data/braille")
+BRAILLE_FILE = pathlib.Path("../../data/braille.jsonl")  # written by convert_to_braille.py
 
 # Output dataset root following Ultralytics YOLO layout
 DATASET_ROOT = pathlib.Path("../../data/braille_yolo_hd")
@@ -46,23 +53,33 @@ UNICODE_BRAILLE_BASE = 0x2800  # Unicode offset for Braille patterns
 NUM_CLASSES = 64               # 0-63 inclusive (Braille has 6 cells, so we can have 2^6 = 64 patterns)
 MAX_BOXES_PER_IMAGE = float('inf')       # discard pages with more than this many boxes
 
+# Pages are independent, so they are rendered across a process pool
+NUM_WORKERS = int(os.getenv("NUM_WORKERS", str(os.cpu_count() or 1)))
+
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
 
 
-def load_braille_files() -> List[pathlib.Path]:
-    """Return all braille *.txt files sorted by name."""
-    return sorted(BRAILLE_DIR.glob("chunk_*.txt"))
+def load_braille_chunks() -> List[Tuple[str, str]]:
+    """Return ``(chunk_id, braille_text)`` for every record, sorted by id."""
+    chunks = []
+    try:
+        with open(BRAILLE_FILE, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    rec = json.loads(line)
+                    chunks.append((rec["id"], rec["braille"].strip()))
+    except OSError as exc:
+        print(f"[WARN] Could not read {BRAILLE_FILE}: {exc}")
+    return [(f"chunk_{i:05d}", text) for i, text in sorted(chunks)]
 
 
-def read_text(path: pathlib.Path) -> str:
-    """Return file contents stripped; empty string on error."""
-    try:
-        return path.read_text(encoding="utf-8").strip()
-    except Exception as exc:
-        print(f"[WARN] Could not read {path}: {exc}")
-        return ""
+def _existing_stems(directory: pathlib.Path, suffix: str, nonempty: bool = False) -> set:
+    """Stems of the *suffix* files in *directory*, from a single directory scan."""
+    with os.scandir(directory) as it:
+        return {e.name[:-len(suffix)] for e in it
+                if e.name.endswith(suffix) and (not nonempty or e.stat().st_size > 0)}
 
 
 def replace_spaces_with_blank_cells(s: str) -> str:
@@ -72,13 +89,8 @@ def replace_spaces_with_blank_cells(s: str) -> str:
 
 def wrap_lines(lines: List[str], max_cols: int) -> List[str]:
     """Wrap each line at *max_cols* to ensure fixed column width."""
-    wrapped: List[str] = []
-    for ln in lines:
-        while len(ln) > max_cols:
-            wrapped.append(ln[:max_cols])
-            ln = ln[max_cols:]
-        wrapped.append(ln)
-    return wrapped
+    # Slice each line at its break offsets; an empty line stays one empty line
+    return [ln[i:i + max_cols] for ln in lines for i in range(0, max(len(ln), 1), max_cols)]
 
 
 def draw_image_and_boxes(page: BraillePage, braille_text: str, *, max_cols: int = 24):
@@ -87,87 +99,87 @@ def draw_image_and_boxes(page: BraillePage, braille_text: str, *, max_cols: int
     bbox: [x, y, w, h] in absolute pixel coords.
     category_id is 0-based to follow YOLO convention.
     """
-    # 1. Prepare text — use the shared sanitisation logic for consistency
+    # 1. Prepare text — use the shared sanitisation logic for consistency (it also wraps)
     lines = _sanitize_text_lines(braille_text.split("\n"), max_cols=max_cols)
 
     # 2. Use the new draw_with_positions method for accurate positioning
     char_spacing = CHAR_SPACING  # pixels between characters (scaled with font size)
-    img, character_positions = page.draw_with_positions(lines, max_cols=max_cols, char_spacing=char_spacing)
-
-    # 3. Create bounding boxes from actual character positions
-    boxes: List[List[int]] = []
-    categories: List[int] = []
+    img, character_positions = page.draw_with_positions(lines, char_spacing=char_spacing)
+
+    # 3. Create bounding boxes from actual character positions, all at once
+    if not character_positions:
+        return img, [], []
+    chars, xs, ys, ws, hs = zip(*character_positions)
+    codes = np.frombuffer("".join(chars).encode("utf-32-le"), dtype=np.uint32)
+    cat_ids = codes - np.uint32(UNICODE_BRAILLE_BASE)
+    # Only process valid Braille characters; unsigned wrap-around also rejects
+    # code points below the Braille block
+    valid = cat_ids < NUM_CLASSES
     
     padding = 3  # padding around each character for better coverage
     
-    for char, x, y, char_width, char_height in character_positions:
-        cat_id_0_based = ord(char) - UNICODE_BRAILLE_BASE
-        
-        # Only process valid Braille characters
-        if 0 <= cat_id_0_based < NUM_CLASSES:
-            # Create bounding box with padding
-            bbox_x = x - padding
-            bbox_y = y - padding
-            bbox_w = char_width + padding * 2
-            bbox_h = char_height + padding * 2
-            
-            boxes.append([bbox_x, bbox_y, bbox_w, bbox_h])
-            categories.append(cat_id_0_based)  # 0-based for YOLO
-
-    return img, boxes, categories
-
-
-def convert_to_yolo_format(bbox: List[int], img_width: int, img_height: int) -> List[float]:
-    """Convert absolute bbox [x, y, w, h] to normalized YOLO format [x_center, y_center, width, height]."""
-    x, y, w, h = bbox
+    # Create bounding boxes with padding
+    pos = np.array([xs, ys, ws, hs], dtype=np.int64).T[valid]
+    pos[:, :2] -= padding
+    pos[:, 2:] += padding * 2
     
-    # Validate bounds (should never trigger with correct logic, but safety check)
-    if x < 0 or y < 0 or x + w > img_width or y + h > img_height:
-        print(f"WARNING: bbox [{x}, {y}, {w}, {h}] out of bounds for image {img_width}×{img_height}")
-        # Clamp to valid bounds
-        x = max(0, min(x, img_width - w))
-        y = max(0, min(y, img_height - h))
-        w = min(w, img_width - x)
-        h = min(h, img_height - y)
+    return img, pos.tolist(), cat_ids[valid].tolist()  # categories 0-based for YOLO
+
+
+def convert_to_yolo_format(bboxes: List[List[int]], img_width: int, img_height: int) -> np.ndarray:
+    """Convert absolute bboxes [x, y, w, h] to normalized YOLO rows [x_center, y_center, width, height].
+
+    All boxes are converted at once; returns an ``(N, 4)`` float array.
+    """
+    x, y, w, h = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4).T
     
-    # Convert to center coordinates
-    x_center = x + w / 2
-    y_center = y + h / 2
+    # Validate bounds (should never trigger with correct logic, but safety check)
+    oob = (x < 0) | (y < 0) | (x + w > img_width) | (y + h > img_height)
+    if oob.any():
+        for bx, by, bw, bh in np.column_stack([x, y, w, h])[oob].astype(int).tolist():
+            print(f"WARNING: bbox [{bx}, {by}, {bw}, {bh}] out of bounds for image {img_width}×{img_height}")
+        # Clamp to valid bounds (a no-op for boxes already inside)
+        x = np.maximum(0, np.minimum(x, img_width - w))
+        y = np.maximum(0, np.minimum(y, img_height - h))
+        w = np.minimum(w, img_width - x)
+        h = np.minimum(h, img_height - y)
     
-    # Normalize by image dimensions
-    x_center_norm = x_center / img_width
-    y_center_norm = y_center / img_height
-    w_norm = w / img_width
-    h_norm = h / img_height
+    # Convert to center coordinates and normalize by image dimensions
+    norm = np.column_stack([(x + w / 2) / img_width, (y + h / 2) / img_height,
+                            w / img_width, h / img_height])
     
     # Final validation - all values should be 0-1
-    if not (0 <= x_center_norm <= 1 and 0 <= y_center_norm <= 1 and 0 <= w_norm <= 1 and 0 <= h_norm <= 1):
-        print(f"WARNING: normalized coords out of range: [{x_center_norm:.3f}, {y_center_norm:.3f}, {w_norm:.3f}, {h_norm:.3f}]")
+    for row in norm[((norm < 0) | (norm > 1)).any(axis=1)].tolist():
+        print(f"WARNING: normalized coords out of range: [{row[0]:.3f}, {row[1]:.3f}, {row[2]:.3f}, {row[3]:.3f}]")
     
-    return [x_center_norm, y_center_norm, w_norm, h_norm]
+    return norm
+
+
+# Use different colors for different classes (cycle through a few colors)
+BBOX_COLORS = ['red', 'blue', 'green', 'orange', 'purple', 'yellow', 'cyan', 'magenta']
+
+
+@functools.lru_cache(maxsize=1)
+def _bbox_font():
+    """Small label font for draw_bboxes_on_image, loaded once per process."""
+    try:
+        # Try to use a small font for labels
+        return ImageFont.truetype("Arial.ttf", 12)
+    except (OSError, IOError):
+        # Fall back to default font
+        return ImageFont.load_default()
 
 
 def draw_bboxes_on_image(img, bboxes: List[List[int]], categories: List[int]):
     """Draw bounding boxes on image for visual verification. Returns modified image."""
-    from PIL import ImageDraw, ImageFont
-    
     # Create a copy to avoid modifying original
     img_with_boxes = img.copy()
     draw = ImageDraw.Draw(img_with_boxes)
-    
-    # Use different colors for different classes (cycle through a few colors)
-    colors = ['red', 'blue', 'green', 'orange', 'purple', 'yellow', 'cyan', 'magenta']
-    
-    try:
-        # Try to use a small font for labels
-        font = ImageFont.truetype("Arial.ttf", 12)
-    except (OSError, IOError):
-        # Fall back to default font
-        font = ImageFont.load_default()
+    font = _bbox_font()
     
     for i, (bbox, cat) in enumerate(zip(bboxes, categories)):
         x, y, w, h = bbox
-        color = colors[cat % len(colors)]
+        color = BBOX_COLORS[cat % len(BBOX_COLORS)]
         
         # Draw rectangle
         draw.rectangle([x, y, x + w, y + h], outline=color, width=1)
@@ -182,11 +194,12 @@ def draw_bboxes_on_image(img, bboxes: List[List[int]], categories: List[int]):
 def save_yolo_labels(labels_file: pathlib.Path, categories: List[int], bboxes: List[List[int]], 
                     img_width: int, img_height: int):
     """Save labels in YOLO format: class x_center y_center width height (normalized)."""
-    with open(labels_file, 'w') as f:
-        for cat, bbox in zip(categories, bboxes):
-            norm_bbox = convert_to_yolo_format(bbox, img_width, img_height)
-            # Format: class x_center y_center width height
-            f.write(f"{cat} {norm_bbox[0]:.6f} {norm_bbox[1]:.6f} {norm_bbox[2]:.6f} {norm_bbox[3]:.6f}\n")
+    norm = convert_to_yolo_format(bboxes, img_width, img_height).tolist()
+    # Format: class x_center y_center width height
+    lines = [f"{cat} {xc:.6f} {yc:.6f} {w:.6f} {h:.6f}\n"
+             for cat, (xc, yc, w, h) in zip(categories, norm)]
+    # One write per label file
+    labels_file.write_text("".join(lines))
 
 
 def create_yaml_configs():
@@ -228,6 +241,91 @@ def create_yaml_configs():
     return cfg_path, data_path
 
 
+# Per-process renderer state, set up by _init_worker
+_page_maker = None
+_photo_aug = None
+
+# Each worker hands its JPEG and label writes to a couple of threads so they
+# overlap with rendering the next page (the JPEG encoder releases the GIL);
+# at most MAX_PENDING_WRITES pages are queued before the worker waits
+_writer: Optional[ThreadPoolExecutor] = None
+_pending_writes: deque = deque()
+MAX_PENDING_WRITES = 4
+
+
+def _drain_writes(limit: int = 0):
+    """Wait until at most *limit* page writes are queued, re-raising any write error."""
+    while len(_pending_writes) > limit:
+        _pending_writes.popleft().result()
+
+
+def _shutdown_writer():
+    _drain_writes()
+    _writer.shutdown()
+
+
+def _write_page(img, images_dir, labels_dir, chunk_id, cats, bboxes):
+    save_jpeg(img, images_dir / f"{chunk_id}.jpg")
+    save_yolo_labels(labels_dir / f"{chunk_id}.txt", cats, bboxes, img.width, img.height)
+
+
+def _init_renderer():
+    """Build the page renderer (font parse and glyph cache) for this process."""
+    global _page_maker, _photo_aug
+    _page_maker = BraillePage(font_size=BRAILLE_FONT_SIZE, margin=30)
+    _photo_aug = PhotoAug()
+
+
+def _init_worker():
+    """Set up a pool worker and give each its own random stream.
+
+    Forked workers inherit the renderer built in main(); spawned ones build their own.
+    """
+    global _writer
+    seed_augmentations(os.getpid())
+    try:
+        import numba
+        numba.set_num_threads(1)  # the pool already occupies every core
+    except ImportError:
+        pass
+    if _page_maker is None:
+        _init_renderer()
+    _writer = ThreadPoolExecutor(max_workers=2)
+    # Runs when the worker exits after pool.close(), so queued pages are written
+    mp.util.Finalize(None, _shutdown_writer, exitpriority=10)
+
+
+def generate_one(task) -> Optional[int]:
+    """Render, augment and save one page with its labels.
+
+    Returns the number of boxes written, or None if the page was skipped.
+    """
+    chunk_id, braille_text, images_dir, labels_dir, report_skips = task  # chunk_id e.g. chunk_00123
+    if not braille_text:
+        return None
+
+    # Generate clean image (+ optional augmentation)
+    img, bboxes, cats = draw_image_and_boxes(_page_maker, braille_text)
+
+    # Skip samples with too many bounding boxes (exceeds model limits)
+    if len(bboxes) > MAX_BOXES_PER_IMAGE:
+        if report_skips and not TEST_SAMPLES:
+            print(f"[SKIP] {chunk_id}: {len(bboxes)} boxes > {MAX_BOXES_PER_IMAGE}")
+        return None
+
+    if AUGMENT_IMAGES:
+        img = _photo_aug(img)
+
+    # Draw bounding boxes for visual verification in test mode
+    if DRAW_BBOXES:
+        img = draw_bboxes_on_image(img, bboxes, cats)
+
+    # Save image and corresponding label file in the background
+    _drain_writes(MAX_PENDING_WRITES - 1)
+    _pending_writes.append(_writer.submit(_write_page, img, images_dir, labels_dir, chunk_id, cats, bboxes))
+    return len(bboxes)
+
+
 # ---------------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------------
@@ -236,118 +334,74 @@ def create_yaml_configs():
 def main():
     print("Generating Braille YOLO-style detection dataset…")
     
-    braille_files = load_braille_files()
-    print(f"Found {len(braille_files):,} braille files to process.")
+    braille_chunks = load_braille_chunks()
+    print(f"Found {len(braille_chunks):,} braille chunks to process.")
     
-    if not braille_files:
-        print("No braille files detected. Did you run convert_to_braille.py?")
+    if not braille_chunks:
+        print("No braille chunks detected. Did you run convert_to_braille.py?")
         return
 
     # Shuffle first for random sampling
-    random.shuffle(braille_files)
+    random.shuffle(braille_chunks)
 
     # Test mode with limited samples
     if TEST_SAMPLES:
         try:
             max_samples = int(TEST_SAMPLES)
-            braille_files = braille_files[:max_samples]
-            print(f"🧪 TEST MODE: Limited to {len(braille_files)} samples (randomly selected)")
+            braille_chunks = braille_chunks[:max_samples]
+            print(f"🧪 TEST MODE: Limited to {len(braille_chunks)} samples (randomly selected)")
             if DRAW_BBOXES:
                 print(f"📦 Bounding boxes will be drawn on images for verification")
         except ValueError:
             print(f"❌ Invalid TEST_SAMPLES value: {TEST_SAMPLES}. Using all files.")
 
     # Split into train/val sets (already shuffled)
-    val_count = int(len(braille_files) * VAL_SPLIT)
-    train_files = braille_files[val_count:]
-    val_files = braille_files[:val_count]
+    val_count = int(len(braille_chunks) * VAL_SPLIT)
+    train_chunks = braille_chunks[val_count:]
+    val_chunks = braille_chunks[:val_count]
     
-    print(f"Train set: {len(train_files):,} files")
-    print(f"Val set:   {len(val_files):,} files")
+    print(f"Train set: {len(train_chunks):,} chunks")
+    print(f"Val set:   {len(val_chunks):,} chunks")
 
-    page_maker = BraillePage(font_size=BRAILLE_FONT_SIZE, margin=30)
-    photo_aug = PhotoAug()
-    
     total_images = 0
     total_annotations = 0
 
-    # Process training set
-    for braille_file in tqdm(train_files, desc="Processing train set", unit="img"):
-        chunk_id = braille_file.stem  # e.g. chunk_00123
-        braille_text = read_text(braille_file)
-        if not braille_text:
-            continue
-
-        # Generate clean image (+ optional augmentation)
-        img, bboxes, cats = draw_image_and_boxes(page_maker, braille_text)
-        
-        # Skip samples with too many bounding boxes (exceeds model limits)
-        if len(bboxes) > MAX_BOXES_PER_IMAGE:
-            continue
-
-        if AUGMENT_IMAGES:
-            img = photo_aug(img)
-
-        # Draw bounding boxes for visual verification in test mode
-        if DRAW_BBOXES:
-            img = draw_bboxes_on_image(img, bboxes, cats)
-
-        # Save image
-        file_name = f"{chunk_id}.jpg"
-        img_path = TRAIN_IMAGES_DIR / file_name
-        img.save(img_path)
-
-        # Save corresponding label file
-        label_name = f"{chunk_id}.txt"
-        label_path = TRAIN_LABELS_DIR / label_name
-        save_yolo_labels(label_path, cats, bboxes, img.width, img.height)
-
-        total_images += 1
-        total_annotations += len(bboxes)
-
-    # Process validation set
-    for braille_file in tqdm(val_files, desc="Processing val set", unit="img"):
-        chunk_id = braille_file.stem  # e.g. chunk_00123
-        braille_text = read_text(braille_file)
-        if not braille_text:
-            continue
-        
-        # Generate clean image (+ optional augmentation)
-        img, bboxes, cats = draw_image_and_boxes(page_maker, braille_text)
-       
-        # Skip samples with too many bounding boxes (exceeds model limits)
-        if len(bboxes) > MAX_BOXES_PER_IMAGE:
-            if not TEST_SAMPLES:
-                print(f"[SKIP] {chunk_id}: {len(bboxes)} boxes > {MAX_BOXES_PER_IMAGE}")
-            continue
-
-        if AUGMENT_IMAGES:
-            img = photo_aug(img)
-
-        # Draw bounding boxes for visual verification in test mode
-        if DRAW_BBOXES:
-            img = draw_bboxes_on_image(img, bboxes, cats)
-
-        # Save image
-        file_name = f"{chunk_id}.jpg"
-        img_path = VAL_IMAGES_DIR / file_name
-        img.save(img_path)
-
-        # Save corresponding label file
-        label_name = f"{chunk_id}.txt"
-        label_path = VAL_LABELS_DIR / label_name
-        save_yolo_labels(label_path, cats, bboxes, img.width, img.height)
-
-        total_images += 1
-        total_annotations += len(bboxes)
+    splits = [
+        ("train", train_chunks, TRAIN_IMAGES_DIR, TRAIN_LABELS_DIR),
+        ("val", val_chunks, VAL_IMAGES_DIR, VAL_LABELS_DIR),
+    ]
+    # On Linux, fork so workers share the parent's parsed font and glyph cache
+    # copy-on-write. Nothing in the parent has started threads (or numba's
+    # pool) by now, which keeps fork safe; elsewhere spawn as before.
+    ctx = mp.get_context("fork" if sys.platform.startswith("linux") else "spawn")
+    if ctx.get_start_method() == "fork":
+        _init_renderer()
+    with ctx.Pool(NUM_WORKERS, initializer=_init_worker) as pool:
+        for split, chunks, images_dir, labels_dir in splits:
+            # Re-runs: pages with both an image and a label on disk are left alone
+            # (a page without boxes has an empty label, so only images must be non-empty)
+            done = _existing_stems(images_dir, ".jpg", nonempty=True) & _existing_stems(labels_dir, ".txt")
+            tasks = [(chunk_id, text, images_dir, labels_dir, split == "val")
+                     for chunk_id, text in chunks if chunk_id not in done]
+            if len(tasks) < len(chunks):
+                print(f"Skipping {len(chunks) - len(tasks):,} {split} pages already on disk")
+            for n_boxes in tqdm(pool.imap_unordered(generate_one, tasks, chunksize=8),
+                                total=len(chunks), initial=len(chunks) - len(tasks),
+                                desc=f"Processing {split} set", unit="img"):
+                if n_boxes is not None:
+                    total_images += 1
+                    total_annotations += n_boxes
+        # Let workers exit normally so their queued writes are flushed
+        pool.close()
+        pool.join()
 
     # Create YAML config file
     cfg_path, data_path = create_yaml_configs()
 
     print("\n✅ Dataset generation complete! 🦉")
     print(f"Dataset root:     {DATASET_ROOT}")
-    print(f"Train images:     {len(train_files):,}")
-    print(f"Val images:       {len(val_files):,}")
+    print(f"Train images:     {len(train_chunks):,}")
+    print(f"Val images:       {len(val_chunks):,}")
     print(f"Total images:     {total_images:,}")
     print(f"Total annotations: {total_annotations:,}")
     print(f"Classes:          {NUM_CLASSES} (braille_00 to braille_{NUM_CLASSES-1:02d})")
@@ -33,6 +33,8 @@ export default function AssignmentPage() {
         return `Generating audio lesson ${idx}/${total}`;
       case 'audio_ready':
         return `Completed lesson pack ${idx}/${total}`;
+      case 'error':
+        return `Lesson pack generation failed: ${evt.detail}`;
       default:
         return status;
     }